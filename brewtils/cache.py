@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""Caches used while processing requests"""
+
+import collections
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 128
+
+
+class ResultCache(object):
+    """Thread-safe cache of command outputs keyed by their parameters
+
+    Entries are evicted least recently used first once there are more than
+    ``max_size``, and are ignored once they are older than ``ttl``.
+
+    Args:
+        ttl: Time (seconds) an output stays valid. None means outputs don't expire.
+        max_size: Maximum number of outputs to keep
+    """
+
+    def __init__(self, ttl=None, max_size=DEFAULT_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(parameters):
+        """Create a canonical key for a parameter dictionary
+
+        Args:
+            parameters: The resolved parameters
+
+        Returns:
+            A hash of the parameters, or None if they can't be represented as JSON
+            (for example an open file) and so can't be cached
+        """
+        try:
+            canonical = json.dumps(parameters, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get a cached output
+
+        Args:
+            key: Key from ``make_key``
+
+        Returns:
+            Tuple of (True, output) for a hit and (False, None) for a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and (
+                self.ttl is None or time.monotonic() - entry[0] < self.ttl
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+
+            if entry is not None:
+                del self._entries[key]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key, output):
+        """Cache an output, evicting the least recently used if the cache is full
+
+        Args:
+            key: Key from ``make_key``
+            output: The command output
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), output)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all cached outputs"""
+        with self._lock:
+            self._entries.clear()
+
+
+class CompletedRequestCache(object):
+    """Bounded record of recently completed requests and their final state
+
+    Used to recognize redelivered messages for requests that already finished, so
+    the final update can be resent without invoking the command again. The least
+    recently used entries are evicted once there are more than ``max_size``.
+
+    If ``path`` is given entries are kept in a SQLite database at that path, so they
+    survive a plugin restart. Otherwise they are only kept in memory.
+
+    Args:
+        max_size: Maximum number of requests to remember
+        path: Path of the SQLite database file to use
+    """
+
+    def __init__(self, max_size, path=None):
+        self.max_size = max_size
+        self.path = path
+
+        self._lock = threading.Lock()
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS completed ("
+                    "id TEXT PRIMARY KEY, status TEXT, output TEXT, "
+                    "error_class TEXT, used INTEGER)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS completed_used ON completed (used)"
+                )
+            self._counter = itertools.count(
+                (self._db.execute("SELECT MAX(used) FROM completed").fetchone()[0] or 0)
+                + 1
+            )
+        else:
+            self._db = None
+            self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        if self._db is not None:
+            with self._lock:
+                return self._db.execute("SELECT COUNT(*) FROM completed").fetchone()[0]
+
+        return len(self._entries)
+
+    def get(self, request_id):
+        """Get the final state of a completed request
+
+        Args:
+            request_id: The request ID
+
+        Returns:
+            Tuple of (status, output, error_class), or None if the request is unknown
+        """
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT status, output, error_class FROM completed WHERE id = ?",
+                    (request_id,),
+                ).fetchone()
+
+                if row:
+                    with self._db:
+                        self._db.execute(
+                            "UPDATE completed SET used = ? WHERE id = ?",
+                            (next(self._counter), request_id),
+                        )
+
+                return tuple(row) if row else None
+
+            entry = self._entries.get(request_id)
+            if entry is not None:
+                self._entries.move_to_end(request_id)
+
+            return entry
+
+    def put(self, request_id, status, output, error_class):
+        """Record the final state of a completed request
+
+        Args:
+            request_id: The request ID
+            status: The final status
+            output: The final output
+            error_class: The final error class
+        """
+        with self._lock:
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO completed VALUES (?, ?, ?, ?, ?)",
+                        (request_id, status, output, error_class, next(self._counter)),
+                    )
+                    self._db.execute(
+                        "DELETE FROM completed WHERE used <= ("
+                        "SELECT used FROM completed ORDER BY used DESC LIMIT 1 OFFSET ?)",
+                        (self.max_size,),
+                    )
+                return
+
+            self._entries[request_id] = (status, output, error_class)
+            self._entries.move_to_end(request_id)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def close(self):
+        """Close the database, if there is one"""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+                self._entries = collections.OrderedDict()
+
+
+class FileCache(object):
+    """Size-bounded on-disk cache of downloaded files, keyed by file ID
+
+    Each file is stored in ``path`` along with the MD5 sum of its contents, which is
+    checked whenever it's read back. Files are written to a temporary file that's
+    renamed into place, so the cache can be shared by threads and by processes
+    using the same ``path``. Reading a file marks it as recently used, and the
+    least recently used files are removed once the cache is larger than
+    ``max_size``.
+
+    Args:
+        path: Directory to store the files in. Created if it doesn't exist.
+        max_size: Maximum total size (bytes) of the cached files
+        spool_size: Cached files larger than this (bytes) are copied to a temporary
+            file when read instead of into memory. If 0 they're always read into
+            memory.
+    """
+
+    _READ_SIZE = 1024 * 1024
+    _SUFFIX = ".cached"
+
+    def __init__(self, path, max_size, spool_size=0):
+        self.path = path
+        self.max_size = max_size
+        self.spool_size = spool_size
+
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, file_id):
+        """Get a cached file
+
+        Args:
+            file_id: The file ID
+
+        Returns:
+            A file object with the contents of the file, positioned at the start, or
+            None if the file isn't cached (or the cached copy is corrupt)
+        """
+        entry = self._entry(file_id)
+
+        try:
+            with open(entry, "rb") as f:
+                expected = f.read(32).decode("ascii", "replace")
+
+                if self.spool_size > 0:
+                    file_obj = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+                else:
+                    file_obj = io.BytesIO()
+
+                checksum = hashlib.md5()
+                for data in iter(lambda: f.read(self._READ_SIZE), b""):
+                    checksum.update(data)
+                    file_obj.write(data)
+        except OSError:
+            return None
+
+        if checksum.hexdigest() != expected:
+            file_obj.close()
+            self._remove(entry)
+            return None
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        file_obj.seek(0)
+        return file_obj
+
+    def put(self, file_id, file_obj):
+        """Cache a file, evicting the least recently used if the cache is full
+
+        Args:
+            file_id: The file ID
+            file_obj: A seekable file object with the contents of the file. It's
+                read from the start and left positioned at the start.
+
+        Files larger than ``max_size`` aren't cached. Errors writing the file are
+        logged instead of raised.
+        """
+        file_obj.seek(0)
+        checksum = hashlib.md5()
+        temp_path = None
+
+        try:
+            # The checksum is written over the placeholder once the contents are known
+            fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(b"0" * 32)
+
+                for data in iter(lambda: file_obj.read(self._READ_SIZE), b""):
+                    checksum.update(data)
+                    f.write(data)
+
+                size = f.tell()
+                f.seek(0)
+                f.write(checksum.hexdigest().encode("ascii"))
+
+            if size <= self.max_size:
+                os.replace(temp_path, self._entry(file_id))
+                self._evict()
+        except OSError as ex:
+            logger.warning("Unable to cache file %s: %s", file_id, ex)
+        finally:
+            if temp_path is not None:
+                self._remove(temp_path)
+            file_obj.seek(0)
+
+    def _entry(self, file_id):
+        name = hashlib.sha256(str(file_id).encode("utf-8")).hexdigest()
+        return os.path.join(self.path, name + self._SUFFIX)
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(self._SUFFIX):
+                continue
+
+            # Another process could remove the file at any time
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
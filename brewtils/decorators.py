@@ -9,6 +9,7 @@ from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, U
 
 import six
 
+from brewtils.cache import DEFAULT_MAX_SIZE
 from brewtils.choices import process_choices
 from brewtils.display import resolve_form, resolve_schema, resolve_template
 from brewtils.errors import PluginParamError, _deprecate
@@ -33,6 +34,9 @@ __all__ = [
     "system",
 ]
 
+# Valid options for the @command executor argument
+EXECUTORS = ("thread", "process")
+
 
 def client(
     _wrapped=None,  # type: Type
@@ -124,6 +128,9 @@ def command(
     tag=None,  # type: str
     tags=None,  # type: Optional[List[str]]
     allow_any_kwargs=None,  # type: Optional[bool]
+    executor=None,  # type: Optional[str]
+    max_concurrent=None,  # type: Optional[int]
+    cache=None,  # type: Optional[Union[bool, dict]]
 ):
     """Decorator for specifying Command details
 
@@ -156,11 +163,38 @@ def command(
         tags: A list of tags that can be used to filter commands
         allow_any_kwargs: Flag controlling whether passed kwargs will be restricted to
             the Command parameters defined.
+        executor: Where the command body will be run. Valid options are "thread" (the
+            default) and "process". Process commands are run in a worker process, which
+            allows CPU-bound commands to use more than one core. Parameters and output
+            must be picklable. Each process Request still holds one of the Plugin's
+            ``max_concurrent`` worker threads while it runs.
+        max_concurrent: Maximum number of Requests for this command that will be
+            processed at once. Additional Requests wait without using a worker until
+            a running one finishes.
+        cache: Cache the command's output, keyed by its parameters. Only use this
+            for commands whose output depends on nothing but their parameters. Either
+            True, or a dictionary with the optional keys "ttl" (seconds an output
+            stays valid, default no expiration) and "max_size" (number of outputs to
+            keep, default 128).
 
     Returns:
         The decorated function
     """
 
+    if executor not in (None,) + EXECUTORS:
+        raise PluginParamError(
+            "Invalid executor '%s', valid options are %s" % (executor, EXECUTORS)
+        )
+
+    if max_concurrent is not None and (
+        not isinstance(max_concurrent, int) or max_concurrent < 1
+    ):
+        raise PluginParamError(
+            "Invalid max_concurrent '%s', must be a positive integer" % max_concurrent
+        )
+
+    cache = _parse_cache(cache)
+
     if tags is None:
         tags = []
 
@@ -204,6 +238,20 @@ def command(
             metadata=metadata,
             tags=tags,
             allow_any_kwargs=allow_any_kwargs,
+            executor=executor,
+            max_concurrent=max_concurrent,
+            cache=cache,
+        )
+
+    if executor == "process" and inspect.iscoroutinefunction(_wrapped):
+        raise PluginParamError(
+            "Coroutine command '%s' can not use the process executor"
+            % _method_name(_wrapped)
+        )
+
+    if cache and inspect.iscoroutinefunction(_wrapped):
+        raise PluginParamError(
+            "Coroutine command '%s' can not be cached" % _method_name(_wrapped)
         )
 
     if output_type is None:
@@ -232,8 +280,14 @@ def command(
     # Python 2 compatibility
     if hasattr(_wrapped, "__func__"):
         _wrapped.__func__._command = new_command
+        _wrapped.__func__._executor = executor or "thread"
+        _wrapped.__func__._max_concurrent = max_concurrent
+        _wrapped.__func__._cache = cache
     else:
         _wrapped._command = new_command
+        _wrapped._executor = executor or "thread"
+        _wrapped._max_concurrent = max_concurrent
+        _wrapped._cache = cache
 
     return _wrapped
 
@@ -615,6 +669,46 @@ def _initialize_command(method):
     return cmd
 
 
+def _parse_cache(cache):
+    # type: (Optional[Union[bool, dict]]) -> Optional[dict]
+    """Normalize the @command cache option
+
+    Args:
+        cache: The cache option
+
+    Returns:
+        None if caching is disabled, otherwise a dictionary with "ttl" and "max_size"
+
+    Raises:
+        PluginParamError: The cache option is not valid
+    """
+    if cache is None or cache is False:
+        return None
+
+    if cache is True:
+        cache = {}
+
+    if not isinstance(cache, dict) or set(cache) - {"ttl", "max_size"}:
+        raise PluginParamError(
+            "Invalid cache '%s', must be True or a dictionary with the optional keys "
+            "'ttl' and 'max_size'" % (cache,)
+        )
+
+    ttl = cache.get("ttl")
+    if ttl is not None and (
+        isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0
+    ):
+        raise PluginParamError("Invalid cache ttl '%s', must be positive" % (ttl,))
+
+    max_size = cache.get("max_size", DEFAULT_MAX_SIZE)
+    if isinstance(max_size, bool) or not isinstance(max_size, int) or max_size < 1:
+        raise PluginParamError(
+            "Invalid cache max_size '%s', must be a positive integer" % (max_size,)
+        )
+
+    return {"ttl": ttl, "max_size": max_size}
+
+
 def _method_name(method):
     # type: (MethodType) -> str
     """Get the name of a method
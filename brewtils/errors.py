@@ -132,6 +132,16 @@ class DiscardMessageException(RequestProcessException):
     pass
 
 
+class RequeueMessageException(RequestProcessException):
+    """Raising an instance will result in a message being requeued without processing
+
+    This is used when the plugin is shutting down, so the request can be picked up by
+    another instance right away.
+    """
+
+    pass
+
+
 class RepublishRequestException(RequestProcessException):
     """Republish to the end of the message queue
 
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""Request processing metrics
+
+Metrics are recorded by the ``RequestProcessor``, ``PikaConsumer`` and
+``HTTPRequestUpdater``. Recording is disabled until ``start_server`` is called, so
+plugins that don't use metrics only pay for a single check at each recording site.
+
+Once started the metrics are served in the Prometheus text exposition format from
+``http://<host>:<port>/metrics``.
+"""
+
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+logger = logging.getLogger(__name__)
+
+enabled = False
+
+_server = None
+_server_thread = None
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    float("inf"),
+)
+
+
+class _Metric(object):
+    """Base class for metrics with optional labels"""
+
+    metric_type = None
+
+    def __init__(self, name, description, labels=None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels or ())
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+    def render(self):
+        """Render this metric in the Prometheus text format"""
+        lines = [
+            "# HELP %s %s" % (self.name, self.description),
+            "# TYPE %s %s" % (self.name, self.metric_type),
+        ]
+
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.extend(self._render_value(label_values, value))
+
+        return lines
+
+    def _render_value(self, label_values, value):
+        return ["%s%s %s" % (self.name, self._format_labels(label_values), value)]
+
+    def _format_labels(self, label_values, extra=None):
+        pairs = list(zip(self.labels, label_values))
+        if extra:
+            pairs.append(extra)
+
+        if not pairs:
+            return ""
+
+        return "{%s}" % ",".join(
+            '%s="%s"' % (name, _escape(value)) for name, value in pairs
+        )
+
+
+class Counter(_Metric):
+    """A value that only goes up"""
+
+    metric_type = "counter"
+
+    def inc(self, *label_values, **kwargs):
+        if not enabled:
+            return
+
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + kwargs.get(
+                "amount", 1
+            )
+
+
+class Gauge(Counter):
+    """A value that can go up and down"""
+
+    metric_type = "gauge"
+
+    def dec(self, *label_values, **kwargs):
+        self.inc(*label_values, amount=-kwargs.get("amount", 1))
+
+
+class Histogram(_Metric):
+    """Counts observations in buckets, along with their count and sum"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, description, labels=None, buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, description, labels=labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        if not enabled:
+            return
+
+        with self._lock:
+            counts, total = self._values.get(
+                label_values, ([0] * len(self.buckets), 0.0)
+            )
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[label_values] = (counts, total + value)
+
+    def _render_value(self, label_values, value):
+        counts, total = value
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(
+                "%s_bucket%s %d"
+                % (self.name, self._format_labels(label_values, ("le", le)), cumulative)
+            )
+
+        labels = self._format_labels(label_values)
+        lines.append("%s_count%s %d" % (self.name, labels, cumulative))
+        lines.append("%s_sum%s %s" % (self.name, labels, total))
+
+        return lines
+
+
+COMMAND_DURATION = Histogram(
+    "brewtils_command_duration_seconds",
+    "Time spent executing commands",
+    labels=["command"],
+)
+REQUEST_WAIT = Histogram(
+    "brewtils_request_wait_seconds",
+    "Time from receiving a request to starting to process it",
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "brewtils_requests_in_flight",
+    "Requests received from the queue that have not been acked or nacked",
+    labels=["queue"],
+)
+MESSAGES_ACKED = Counter(
+    "brewtils_messages_acked_total",
+    "Messages acked, including messages that were republished",
+    labels=["queue"],
+)
+MESSAGES_NACKED = Counter(
+    "brewtils_messages_nacked_total",
+    "Messages nacked",
+    labels=["queue", "requeue"],
+)
+CONSUMER_RECONNECTS = Counter(
+    "brewtils_consumer_reconnects_total",
+    "Attempts to reconnect a consumer to the queue",
+    labels=["queue"],
+)
+UPDATE_DURATION = Histogram(
+    "brewtils_request_update_duration_seconds",
+    "Time spent sending request updates to Beer-garden",
+    labels=["status"],
+)
+UPDATE_RETRIES = Counter(
+    "brewtils_request_update_retries_total",
+    "Request updates that were retried after a failed attempt",
+)
+CACHE_HITS = Counter(
+    "brewtils_cache_hits_total",
+    "Requests answered from a command's result cache",
+    labels=["command"],
+)
+CACHE_MISSES = Counter(
+    "brewtils_cache_misses_total",
+    "Requests for a cached command that had to invoke it",
+    labels=["command"],
+)
+
+METRICS = [
+    COMMAND_DURATION,
+    REQUEST_WAIT,
+    REQUESTS_IN_FLIGHT,
+    MESSAGES_ACKED,
+    MESSAGES_NACKED,
+    CONSUMER_RECONNECTS,
+    UPDATE_DURATION,
+    UPDATE_RETRIES,
+    CACHE_HITS,
+    CACHE_MISSES,
+]
+
+
+def render():
+    """Render all metrics in the Prometheus text format
+
+    Returns:
+        str: The rendered metrics
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render().encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_server(port, host="127.0.0.1"):
+    """Enable metrics and start serving them
+
+    Args:
+        port (int): Port to listen on. 0 will pick a free port.
+        host (str): Address to listen on
+
+    Returns:
+        The (host, port) the server is listening on
+    """
+    global enabled, _server, _server_thread
+
+    if _server is None:
+        _server = HTTPServer((host, port), _MetricsHandler)
+        _server_thread = threading.Thread(
+            target=_server.serve_forever, name="Metrics Server"
+        )
+        _server_thread.daemon = True
+        _server_thread.start()
+
+        logger.info("Serving metrics on %s:%s", *_server.server_address[:2])
+
+    enabled = True
+
+    return _server.server_address[:2]
+
+
+def stop_server():
+    """Stop serving metrics and disable recording"""
+    global enabled, _server, _server_thread
+
+    enabled = False
+
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server_thread.join()
+
+        _server = None
+        _server_thread = None
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
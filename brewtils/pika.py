@@ -2,7 +2,10 @@
 from __future__ import absolute_import
 
 import logging
+import os
 import ssl as pyssl
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
 
 from pika import (
@@ -14,13 +17,28 @@ from pika import (
     SSLOptions,
     URLParameters,
 )
-from pika.exceptions import AMQPError, ConnectionWrongStateError
+from pika.exceptions import (
+    AMQPConnectionError,
+    AMQPError,
+    ChannelClosed,
+    ChannelWrongStateError,
+    ConnectionWrongStateError,
+)
 from pika.spec import PERSISTENT_DELIVERY_MODE
 
-from brewtils.errors import DiscardMessageException, RepublishRequestException
+from brewtils import metrics
+from brewtils.errors import (
+    DiscardMessageException,
+    RepublishRequestException,
+    RequeueMessageException,
+)
 from brewtils.request_handling import RequestConsumer
 from brewtils.schema_parser import SchemaParser
 
+# Errors publishing that mean the connection or channel can't be used anymore. Other
+# channel errors (like an unroutable or nacked message) leave the channel usable.
+_LOST_PUBLISHER_ERRORS = (AMQPConnectionError, ChannelClosed, ChannelWrongStateError)
+
 
 class PikaClient(object):
     """Base class for connecting to RabbitMQ using Pika
@@ -149,11 +167,34 @@ class PikaClient(object):
 
 
 class TransientPikaClient(PikaClient):
-    """Client implementation that creates new connection and channel for each action"""
+    """Client implementation that creates new connection and channel for each action
+
+    The exception is ``publish``, which reuses connections kept in a pool instead of
+    opening a new connection for every message. Each pooled connection is only
+    used by one thread at a time. Idle connections don't service heartbeats, so
+    they are checked before being reused and any the broker has dropped are
+    replaced.
+
+    Pooled connections stay open until ``close`` is called. Nothing in brewtils
+    does this, so whatever creates a TransientPikaClient and publishes with it must
+    call ``close`` once it's finished publishing, for example when it shuts down.
+
+    Args:
+        publish_pool_size: Number of idle connections to keep open for publishing.
+            If 0 every message is published using a new connection.
+    """
 
     def __init__(self, **kwargs):
         super(TransientPikaClient, self).__init__(**kwargs)
 
+        self._publish_pool_size = kwargs.get("publish_pool_size", 4)
+
+        # Idle (connection, channel) pairs, keyed by whether the channel is in
+        # publisher-acknowledgements mode
+        self._publishers = {}
+        self._publishers_lock = threading.Lock()
+        self._publishers_pid = os.getpid()
+
     def is_alive(self):
         try:
             with BlockingConnection(
@@ -203,28 +244,120 @@ class TransientPikaClient(PikaClient):
             * *priority* --
               Message priority
         """
-        with BlockingConnection(self._conn_params) as conn:
-            channel = conn.channel()
+        confirm = bool(kwargs.get("confirm"))
+        properties = BasicProperties(
+            app_id="beer-garden",
+            content_type="text/plain",
+            headers=kwargs.get("headers"),
+            expiration=kwargs.get("expiration"),
+            delivery_mode=kwargs.get("delivery_mode"),
+            priority=kwargs.get("priority"),
+        )
+        publish_args = {
+            "exchange": self._exchange,
+            "routing_key": kwargs["routing_key"],
+            "body": message,
+            "properties": properties,
+            "mandatory": kwargs.get("mandatory"),
+        }
 
-            if kwargs.get("confirm"):
+        publisher = self._take_publisher(confirm)
+        if publisher is not None:
+            try:
+                self._publish(publisher, confirm, publish_args)
+                return
+            except _LOST_PUBLISHER_ERRORS:
+                # With publisher-acknowledgements the connection may have been lost
+                # while waiting for the broker to confirm a message it had already
+                # received, so publishing again could duplicate it
+                if confirm:
+                    raise
+
+        self._publish(self._new_publisher(confirm), confirm, publish_args)
+
+    def close(self):
+        """Close the connections kept for publishing
+
+        This should be called by the owner of this client once it's done publishing.
+        The client can still be used afterwards, it will open new connections.
+        """
+        with self._publishers_lock:
+            publishers = [p for pool in self._publishers.values() for p in pool]
+            self._publishers = {}
+
+        for publisher in publishers:
+            self._close_connection(publisher[0])
+
+    def _publish(self, publisher, confirm, publish_args):
+        try:
+            publisher[1].basic_publish(**publish_args)
+        except _LOST_PUBLISHER_ERRORS:
+            self._close_connection(publisher[0])
+            raise
+        except Exception:
+            self._put_publisher(publisher, confirm)
+            raise
+
+        self._put_publisher(publisher, confirm)
+
+    def _new_publisher(self, confirm):
+        connection = BlockingConnection(self._conn_params)
+
+        try:
+            channel = connection.channel()
+            if confirm:
                 channel.confirm_delivery()
+        except Exception:
+            self._close_connection(connection)
+            raise
 
-            properties = BasicProperties(
-                app_id="beer-garden",
-                content_type="text/plain",
-                headers=kwargs.get("headers"),
-                expiration=kwargs.get("expiration"),
-                delivery_mode=kwargs.get("delivery_mode"),
-                priority=kwargs.get("priority"),
-            )
+        return connection, channel
 
-            channel.basic_publish(
-                exchange=self._exchange,
-                routing_key=kwargs["routing_key"],
-                body=message,
-                properties=properties,
-                mandatory=kwargs.get("mandatory"),
-            )
+    def _take_publisher(self, confirm):
+        while True:
+            with self._publishers_lock:
+                # Connections inherited from a parent process can't be shared with it
+                if self._publishers_pid != os.getpid():
+                    self._publishers = {}
+                    self._publishers_pid = os.getpid()
+
+                pool = self._publishers.get(confirm)
+                if not pool:
+                    return None
+
+                publisher = pool.pop()
+
+            # Process anything received while idle, including the broker closing a
+            # connection that missed its heartbeats
+            try:
+                publisher[0].process_data_events(time_limit=0)
+            except AMQPError:
+                pass
+
+            if publisher[0].is_open and publisher[1].is_open:
+                return publisher
+
+            self._close_connection(publisher[0])
+
+    def _put_publisher(self, publisher, confirm):
+        with self._publishers_lock:
+            pool = self._publishers.setdefault(confirm, [])
+
+            if (
+                self._publishers_pid == os.getpid()
+                and len(pool) < self._publish_pool_size
+            ):
+                pool.append(publisher)
+                return
+
+        self._close_connection(publisher[0])
+
+    @staticmethod
+    def _close_connection(connection):
+        try:
+            connection.close()
+        except AMQPError:
+            pass
 
 
 class PikaConsumer(RequestConsumer):
@@ -247,6 +380,17 @@ class PikaConsumer(RequestConsumer):
         logger (logging.Logger): A configured Logger
         thread_name (str): Name to use for this thread
         max_concurrent: (int) Maximum requests to process concurrently
+        adaptive_prefetch (bool): Periodically adjust the prefetch count so that about
+            one received message is waiting to be processed (see ``adjust_prefetch``).
+            This only has an effect if ``max_concurrent`` is above the number of
+            workers, so that messages can wait locally.
+        min_prefetch (int): Lowest prefetch count used when ``adaptive_prefetch`` is
+            set. The highest is ``max_concurrent``.
+        prefetch_interval (float): Time (seconds) between adaptive prefetch updates
+        parse_workers (int): Number of threads used to run ``on_message_callback``.
+            If 0 (the default) it runs on the IOLoop thread, which means large
+            messages delay heartbeats, acks and other deliveries while they're
+            parsed.
         max_reconnect_attempts (int): Number of times to attempt reconnection to message
             queue before giving up (default -1 aka never)
         max_reconnect_timeout (int): Maximum time to wait before reconnect attempt
@@ -265,12 +409,26 @@ class PikaConsumer(RequestConsumer):
         self._connection = None
         self._channel = None
         self._consumer_tag = None
+        self._paused = False
+        self._stopped_consuming = False
 
         self._queue_name = queue_name
         self._panic_event = panic_event
         self._max_concurrent = kwargs.get("max_concurrent", 1)
         self.logger = logger or logging.getLogger(__name__)
 
+        self._adaptive_prefetch = kwargs.get("adaptive_prefetch", False)
+        self._min_prefetch = max(
+            1, min(kwargs.get("min_prefetch", 1), self._max_concurrent)
+        )
+        self._prefetch_interval = kwargs.get("prefetch_interval", 5)
+        self._prefetch_count = self._max_concurrent
+        self._prefetch_stats = _PrefetchStats()
+
+        self._parse_pool = None
+        if kwargs.get("parse_workers", 0) > 0:
+            self._parse_pool = ThreadPoolExecutor(max_workers=kwargs["parse_workers"])
+
         self._max_reconnect_attempts = kwargs.get("max_reconnect_attempts", -1)
         self._max_reconnect_timeout = kwargs.get("max_reconnect_timeout", 30)
         self._reconnect_timeout = kwargs.get("starting_reconnect_timeout", 5)
@@ -304,6 +462,13 @@ class PikaConsumer(RequestConsumer):
         Returns:
             None
         """
+        try:
+            self._run()
+        finally:
+            if self._parse_pool:
+                self._parse_pool.shutdown(wait=False)
+
+    def _run(self):
         while not self._panic_event.is_set():
             try:
                 self._connection = self.open_connection()
@@ -323,6 +488,7 @@ class PikaConsumer(RequestConsumer):
                     self._panic_event.wait(self._reconnect_timeout)
 
                     self._reconnect_attempt += 1
+                    metrics.CONSUMER_RECONNECTS.inc(self._queue_name)
                     self._reconnect_timeout = min(
                         self._reconnect_timeout * 2, self._max_reconnect_timeout
                     )
@@ -368,6 +534,9 @@ class PikaConsumer(RequestConsumer):
         BasicProperties with the message properties and the body is the message
         that was sent.
 
+        If the consumer has parse workers the message is handed to one of them, so
+        decoding, parsing and validating it doesn't block the IOLoop.
+
         Args:
             channel (pika.channel.Channel): The channel object
             basic_deliver (pika.Spec.Basic.Deliver): basic_deliver method
@@ -382,24 +551,79 @@ class PikaConsumer(RequestConsumer):
             body,
         )
 
+        if self._adaptive_prefetch:
+            self._prefetch_stats.delivered(basic_deliver.delivery_tag)
+
+        metrics.REQUESTS_IN_FLIGHT.inc(self._queue_name)
+
+        if self._parse_pool:
+            # Failures surface through the future, so finish_message nacks them
+            future = self._parse_pool.submit(
+                self._schedule_offloaded, basic_deliver, properties, body
+            )
+            future.add_done_callback(
+                partial(self.on_message_callback_complete, basic_deliver)
+            )
+            return
+
+        try:
+            future = self._schedule(basic_deliver, properties, body)
+            future.add_done_callback(
+                partial(self.on_message_callback_complete, basic_deliver)
+            )
+        except Exception as ex:
+            requeue = not isinstance(ex, DiscardMessageException)
+            self.logger.exception(
+                "Exception while trying to schedule message %s, about to nack%s: %s"
+                % (basic_deliver.delivery_tag, " and requeue" if requeue else "", ex)
+            )
+            self._channel.basic_nack(basic_deliver.delivery_tag, requeue=requeue)
+
+            metrics.REQUESTS_IN_FLIGHT.dec(self._queue_name)
+            metrics.MESSAGES_NACKED.inc(
+                self._queue_name, "true" if requeue else "false"
+            )
+
+    def _schedule(self, basic_deliver, properties, body):
+        """Pass a message to the on_message_callback
+
+        Returns:
+            The Future returned by the callback
+        """
         # Pika gives us bytes, but we want a string to be ok too
         try:
             body = body.decode()
         except AttributeError:
             pass
 
+        return self._on_message_callback(
+            body,
+            properties.headers,
+            priority=properties.priority,
+            redelivered=basic_deliver.redelivered,
+        )
+
+    def _schedule_offloaded(self, basic_deliver, properties, body):
+        """Pass a message to the on_message_callback from a parse worker
+
+        Exceptions are translated to the ones finish_message nacks for, matching
+        what on_message does when scheduling on the IOLoop thread.
+
+        Returns:
+            The Future returned by the callback
+        """
         try:
-            future = self._on_message_callback(body, properties.headers)
-            future.add_done_callback(
-                partial(self.on_message_callback_complete, basic_deliver)
-            )
+            return self._schedule(basic_deliver, properties, body)
         except Exception as ex:
             requeue = not isinstance(ex, DiscardMessageException)
             self.logger.exception(
                 "Exception while trying to schedule message %s, about to nack%s: %s"
                 % (basic_deliver.delivery_tag, " and requeue" if requeue else "", ex)
             )
-            self._channel.basic_nack(basic_deliver.delivery_tag, requeue=requeue)
+
+            if isinstance(ex, (DiscardMessageException, RequeueMessageException)):
+                raise
+            raise RequeueMessageException(ex)
 
     def on_message_callback_complete(self, basic_deliver, future):
         """Invoked when the future returned by _on_message_callback completes.
@@ -407,6 +631,10 @@ class PikaConsumer(RequestConsumer):
         This method will be invoked from the threadpool context. It's only purpose is to
         schedule the final processing steps to take place on the connection's ioloop.
 
+        If processing completed with another Future (for example, a request update
+        that was queued by a ``QueuedHTTPRequestUpdater``) then message processing
+        isn't really finished until that Future completes, so wait for it instead.
+
         Args:
             basic_deliver:
             future: Completed future
@@ -414,6 +642,16 @@ class PikaConsumer(RequestConsumer):
         Returns:
             None
         """
+        if (
+            not future.cancelled()
+            and future.exception() is None
+            and isinstance(future.result(), Future)
+        ):
+            future.result().add_done_callback(
+                partial(self.on_message_callback_complete, basic_deliver)
+            )
+            return
+
         self._connection.ioloop.add_callback_threadsafe(
             partial(self.finish_message, basic_deliver, future)
         )
@@ -429,8 +667,10 @@ class PikaConsumer(RequestConsumer):
 
         - If there is no exception it acks the message
         - If there is an exception
-            - If the exception is an instance of DiscardMessageException it acks the
+            - If the exception is an instance of DiscardMessageException it nacks the
               message and does not requeue it
+            - If the exception is an instance of RequeueMessageException it nacks the
+              message and requeues it
             - If the exception is an instance of RepublishRequestException it will
               construct an entirely new BlockingConnection, use that to publish a new
               message, and then ack the original message
@@ -449,10 +689,23 @@ class PikaConsumer(RequestConsumer):
         """
         delivery_tag = basic_deliver.delivery_tag
 
-        if not future.exception():
+        if self._adaptive_prefetch:
+            self._prefetch_stats.finished(delivery_tag)
+
+        metrics.REQUESTS_IN_FLIGHT.dec(self._queue_name)
+
+        if future.cancelled():
+            # Processing was abandoned during shutdown
+            self.logger.debug(
+                "Nacking cancelled message %s and requeuing", delivery_tag
+            )
+            self._channel.basic_nack(delivery_tag, requeue=True)
+            metrics.MESSAGES_NACKED.inc(self._queue_name, "true")
+        elif not future.exception():
             try:
                 self.logger.debug("Acking message %s", delivery_tag)
                 self._channel.basic_ack(delivery_tag)
+                metrics.MESSAGES_ACKED.inc(self._queue_name)
             except Exception as ex:
                 self.logger.exception(
                     "Error acking message %s, about to shut down: %s", delivery_tag, ex
@@ -481,6 +734,7 @@ class PikaConsumer(RequestConsumer):
                         )
 
                     self._channel.basic_ack(delivery_tag)
+                    metrics.MESSAGES_ACKED.inc(self._queue_name)
                 except Exception as ex:
                     self.logger.exception(
                         "Error republishing message %s, about to shut down: %s",
@@ -488,11 +742,16 @@ class PikaConsumer(RequestConsumer):
                         ex,
                     )
                     self._panic_event.set()
+            elif isinstance(real_ex, RequeueMessageException):
+                self.logger.debug("Nacking message %s and requeuing", delivery_tag)
+                self._channel.basic_nack(delivery_tag, requeue=True)
+                metrics.MESSAGES_NACKED.inc(self._queue_name, "true")
             elif isinstance(real_ex, DiscardMessageException):
                 self.logger.info(
                     "Nacking message %s, not attempting to requeue", delivery_tag
                 )
                 self._channel.basic_nack(delivery_tag, requeue=False)
+                metrics.MESSAGES_NACKED.inc(self._queue_name, "false")
             else:
                 # If request processing throws anything else we terminate
                 self.logger.exception(
@@ -624,7 +883,8 @@ class PikaConsumer(RequestConsumer):
 
         The RabbitMQ prefetch is set to the maximum number of concurrent
         consumers. This ensures that messages remain in RabbitMQ until a
-        consuming thread is available to process them.
+        consuming thread is available to process them. If ``adaptive_prefetch`` is
+        set the prefetch will then be adjusted periodically by ``adjust_prefetch``.
 
         An on_cancel_callback is registered so that the consumer is notified if
         it is canceled by the broker.
@@ -634,13 +894,82 @@ class PikaConsumer(RequestConsumer):
         """
         self.logger.debug("Issuing consumer related RPC commands")
 
-        self._channel.basic_qos(prefetch_count=self._max_concurrent)
+        self._prefetch_count = self._max_concurrent
+        self._channel.basic_qos(prefetch_count=self._prefetch_count)
         self._channel.add_on_cancel_callback(self.on_consumer_cancelled)
 
+        # A new channel starts out consuming, whatever the old one was doing
+        self._paused = False
+
         self._consumer_tag = self._channel.basic_consume(
             queue=self._queue_name, on_message_callback=self.on_message
         )
 
+        if self._adaptive_prefetch:
+            # Delivery tags are per-channel, so start over with this one
+            self._prefetch_stats = _PrefetchStats()
+            self._connection.ioloop.call_later(
+                self._prefetch_interval, self.adjust_prefetch
+            )
+
+    def adjust_prefetch(self):
+        """Adjust the prefetch count so that about one message is waiting
+
+        This runs on the IOLoop every ``prefetch_interval`` seconds, if any messages
+        were finished since the last adjustment. One waiting message means a worker
+        that finishes can start on it straight away while the ack goes back to the
+        broker.
+
+        Messages can only be waiting when the prefetch is above the number of
+        workers, so ``max_concurrent`` needs to be above that for the prefetch to be
+        raised or lowered:
+
+        - If more than one message is waiting to be processed the prefetch is
+          lowered by the excess, leaving it in RabbitMQ where other consumers can
+          take it
+        - If none are waiting and the consumer has hit its prefetch limit then the
+          workers may be going idle waiting for deliveries, so the prefetch is raised
+          by one
+
+        The prefetch count always stays between ``min_prefetch`` and
+        ``max_concurrent``.
+
+        Returns:
+            None
+        """
+        if not (self._channel and self._channel.is_open):
+            return
+
+        stats, self._prefetch_stats = self._prefetch_stats, self._prefetch_stats.reset()
+
+        if stats.count:
+            backlog = self.backlog_callback() if self.backlog_callback else 0
+
+            new_count = self._prefetch_count
+            if backlog > 1:
+                new_count -= backlog - 1
+            elif backlog == 0 and stats.peak_unacked >= self._prefetch_count:
+                new_count += 1
+
+            new_count = max(self._min_prefetch, min(new_count, self._max_concurrent))
+
+            self.logger.debug(
+                "Prefetch stats for %s: %i finished, %i waiting, prefetch %i -> %i",
+                self._queue_name,
+                stats.count,
+                backlog,
+                self._prefetch_count,
+                new_count,
+            )
+
+            if new_count != self._prefetch_count:
+                self._prefetch_count = new_count
+                self._channel.basic_qos(prefetch_count=new_count)
+
+        self._connection.ioloop.call_later(
+            self._prefetch_interval, self.adjust_prefetch
+        )
+
     def stop_consuming(self):
         """Stop consuming messages
 
@@ -650,6 +979,8 @@ class PikaConsumer(RequestConsumer):
         Returns:
             None
         """
+        self._stopped_consuming = True
+
         if self._channel and self._channel.is_open:
             self.logger.debug("Stopping message consuming on channel %i", self._channel)
 
@@ -661,6 +992,54 @@ class PikaConsumer(RequestConsumer):
                 )
             )
 
+    def pause_consuming(self):
+        """Stop deliveries until ``resume_consuming`` is called
+
+        This cancels the consumer, so the broker stops sending it messages while the
+        messages already delivered stay unacked on the channel. Messages sent before
+        the broker processes the cancel are still delivered. Safe to call from any
+        thread.
+
+        Returns:
+            None
+        """
+        if self._connection:
+            self._connection.ioloop.add_callback_threadsafe(self._pause)
+
+    def resume_consuming(self):
+        """Start deliveries again after ``pause_consuming``
+
+        Safe to call from any thread.
+
+        Returns:
+            None
+        """
+        if self._connection:
+            self._connection.ioloop.add_callback_threadsafe(self._resume)
+
+    def _pause(self):
+        if self._paused or not (self._channel and self._channel.is_open):
+            return
+
+        self.logger.debug("Pausing message consuming on %s", self._queue_name)
+        self._paused = True
+        self._channel.basic_cancel(
+            consumer_tag=self._consumer_tag, callback=lambda *args: None
+        )
+
+    def _resume(self):
+        if not self._paused:
+            return
+
+        self._paused = False
+        if self._stopped_consuming or not (self._channel and self._channel.is_open):
+            return
+
+        self.logger.debug("Resuming message consuming on %s", self._queue_name)
+        self._consumer_tag = self._channel.basic_consume(
+            queue=self._queue_name, on_message_callback=self.on_message
+        )
+
     def on_consumer_cancelled(self, method_frame):
         """Consumer cancelled callback
 
@@ -678,3 +1057,27 @@ class PikaConsumer(RequestConsumer):
 
         if self._channel:
             self._connection.close()
+
+
+class _PrefetchStats(object):
+    """Message counts used by adaptive prefetch, updated on the IOLoop"""
+
+    def __init__(self, unacked=None):
+        self.count = 0
+
+        # Delivery tags of messages that haven't been acked or nacked
+        self.unacked = unacked if unacked is not None else set()
+        self.peak_unacked = len(self.unacked)
+
+    def reset(self):
+        """Create stats for the next interval, keeping track of unacked messages"""
+        return _PrefetchStats(unacked=self.unacked)
+
+    def delivered(self, delivery_tag):
+        self.unacked.add(delivery_tag)
+        self.peak_unacked = max(self.peak_unacked, len(self.unacked))
+
+    def finished(self, delivery_tag):
+        if delivery_tag in self.unacked:
+            self.unacked.discard(delivery_tag)
+            self.count += 1
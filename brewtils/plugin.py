@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import contextvars
 import copy
+import inspect
 import json
 import logging
 import logging.config
@@ -16,6 +18,8 @@ from packaging.version import Version
 from requests import ConnectionError as RequestsConnectionError
 
 import brewtils
+from brewtils import metrics
+from brewtils.cache import CompletedRequestCache, FileCache
 from brewtils.config import load_config
 from brewtils.decorators import _parse_client
 from brewtils.display import resolve_template
@@ -33,6 +37,7 @@ from brewtils.models import Instance, System
 from brewtils.request_handling import (
     AdminProcessor,
     HTTPRequestUpdater,
+    QueuedHTTPRequestUpdater,
     RequestConsumer,
     RequestProcessor,
 )
@@ -40,9 +45,28 @@ from brewtils.resolvers.manager import ResolutionManager
 from brewtils.rest.easy_client import EasyClient
 from brewtils.specification import _CONNECTION_SPEC
 
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class _RequestContext(threading.local):
+    """Holds the Request currently being processed
+
+    The current Request is kept in a context variable. Each thread has its own
+    context, and so does each asyncio task, so coroutine commands sharing the event
+    loop thread each see their own Request.
+    """
+
+    @property
+    def current_request(self):
+        return _current_request.get()
+
+    @current_request.setter
+    def current_request(self, request):
+        _current_request.set(request)
+
+
 # This is what enables request nesting to work easily
-request_context = threading.local()
-request_context.current_request = None
+request_context = _RequestContext()
 
 # Global config, used to simplify BG client creation and sanity checks.
 CONFIG = Box(default_box=True)
@@ -130,6 +154,10 @@ class Plugin(object):
     :py:class:`concurrent.futures.ThreadPoolExecutor`. The maximum number of
     threads available is controlled by the ``max_concurrent`` argument.
 
+    Commands defined as coroutines (``async def``) are instead run on a dedicated
+    asyncio event loop. The number of these processed concurrently is controlled by
+    the ``max_concurrent_async`` argument.
+
     .. warning::
         Normally the processing of each Request occurs in a distinct thread context. If
         you need to access shared state please be careful to use appropriate
@@ -191,6 +219,70 @@ class Plugin(object):
 
         worker_shutdown_timeout (int): Time to wait during shutdown to finish processing
         max_concurrent (int): Maximum number of requests to process concurrently from RabbitMQ
+        max_prefetch (int): Maximum number of requests to receive from RabbitMQ.
+            Requests beyond ``max_concurrent`` wait locally and are started in
+            priority order.
+        adaptive_prefetch (bool): Adjust the RabbitMQ prefetch between
+            ``min_prefetch`` and ``max_prefetch`` so that about one received request
+            is waiting for a worker. The prefetch is lowered while more are waiting
+            and raised when none are and the prefetch was reached, so it follows the
+            number of busy workers. Processing time isn't used. If ``max_prefetch``
+            isn't above ``max_concurrent`` twice ``max_concurrent`` is used instead,
+            since the prefetch could otherwise never be raised.
+        min_prefetch (int): Lowest RabbitMQ prefetch used with ``adaptive_prefetch``
+        parse_workers (int): Number of threads used to parse and validate received
+            requests. If 0 (the default) this happens on the thread that talks to
+            RabbitMQ.
+        max_concurrent_async (int): Maximum number of requests for coroutine commands
+            (``async def``) to process concurrently. These run on an event loop rather
+            than in the thread pool. If the client has any coroutine commands this is
+            added to the RabbitMQ prefetch, and requests for any command can use that
+            extra prefetch to wait locally for a worker, so keep it modest.
+        max_process_workers (int): Maximum number of worker processes used for
+            commands declared with ``@command(executor="process")``. If 0 (the
+            default) the number of processors on the machine is used. Each of these
+            requests also holds a worker thread while it runs, so at most
+            ``max_concurrent`` of them run at once.
+        process_start_method (str): Multiprocessing start method used for those
+            worker processes, "spawn" (the default), "forkserver" or "fork". Forking
+            a plugin that's running threads can deadlock the new worker.
+        max_concurrent_updates (int): Number of background threads used to send
+            Request updates. If 0 (the default) updates are sent by the thread
+            processing the Request.
+        in_progress_delay (int): Time (milliseconds) a command must run before the
+            IN_PROGRESS Request update is sent. Commands that finish sooner only send
+            the final update.
+        max_output_size (int): Request outputs larger than this (bytes) are uploaded
+            using the chunked file API and replaced with a reference to the file. If
+            0 (the default) outputs are always sent inline.
+        download_spool_size (int): Chunked file parameters larger than this (bytes)
+            are written to a temporary file while they're downloaded. If 0 (the
+            default) they are always downloaded into memory.
+        chunk_workers (int): Number of chunks to send or fetch concurrently when
+            uploading or downloading chunked files
+        completed_request_cache_size (int): Number of completed Requests to remember.
+            If a message is redelivered for a remembered Request only the final update
+            is sent again. If 0 (the default) completed Requests aren't remembered.
+        completed_request_cache_path (str): File used to remember completed Requests
+            across restarts, relative to the working directory. If not set they are
+            only remembered in memory.
+        file_cache_size (int): Maximum size (bytes) of the on-disk cache of
+            downloaded bytes and base64 parameters. If 0 (the default) they aren't
+            cached.
+        file_cache_path (str): Directory used for the file cache, relative to the
+            working directory. Plugins on the same host can share it.
+        metrics_port (int): Port to serve request processing metrics on, in the
+            Prometheus text format. Metrics are only recorded if this is set.
+        metrics_host (str): Address to serve request processing metrics on
+        drain_timeout (int): Time (seconds) to wait during shutdown for running
+            Requests to finish. Requests that haven't started are requeued right away.
+            Requests still running at the timeout are requeued and their results are
+            discarded, but the process does not exit until they finish (see
+            ``drain_exit``). Negative numbers (the default) wait for every received
+            Request.
+        drain_exit (bool): If the drain abandoned any Requests, exit the process
+            with ``os._exit`` as soon as the plugin has shut down rather than
+            waiting for them. Code after ``run`` and ``atexit`` handlers won't run.
         max_attempts (int): Number of times to attempt updating of a Request
             before giving up. Negative numbers are interpreted as no maximum.
         max_timeout (int): Maximum amount of time to wait between Request update
@@ -212,6 +304,7 @@ class Plugin(object):
         self._instance = None
         self._admin_processor = None
         self._request_processor = None
+        self._drain_stats = None
         self._shutdown_event = threading.Event()
 
         # Need to set up logging before loading config
@@ -286,6 +379,16 @@ class Plugin(object):
         finally:
             self._logger.info("Plugin %s has terminated", self.unique_name)
 
+        # Abandoned requests are still running in non-daemon worker threads, which
+        # would stop the interpreter from exiting until they finish
+        abandoned = self._drain_stats["abandoned"] if self._drain_stats else 0
+        if abandoned and self._config.drain_exit:
+            self._logger.warning(
+                "Exiting without waiting for %i abandoned requests", abandoned
+            )
+            logging.shutdown()
+            os._exit(0)
+
     @property
     def client(self):
         return self._client
@@ -467,6 +570,11 @@ class Plugin(object):
             if not workdir.exists():
                 workdir.mkdir(parents=True)
 
+        if self._config.metrics_port is not None:
+            metrics.start_server(
+                self._config.metrics_port, host=self._config.metrics_host
+            )
+
         self._logger.debug("Initializing and starting processors")
         self._admin_processor, self._request_processor = self._initialize_processors()
         self._admin_processor.startup()
@@ -488,7 +596,8 @@ class Plugin(object):
 
         This method gracefully stops the plugin. When it completes the plugin should be
         considered in a "stopped" state - the message processors shut down and all
-        connections closed.
+        connections closed. If the request processor was drained its statistics are
+        kept in ``_drain_stats``.
         """
         self._logger.debug("About to shut down plugin %s", self.unique_name)
         self._shutdown_event.set()
@@ -496,11 +605,14 @@ class Plugin(object):
         self._logger.debug("Shutting down processors")
         # Join will cause an exception if processor thread wasn't started
         try:
-            self._request_processor.shutdown()
+            self._drain_stats = self._request_processor.shutdown()
         except RuntimeError:
             pass
         self._admin_processor.shutdown()
 
+        if self._config.metrics_port is not None:
+            metrics.stop_server()
+
         try:
             self._ez_client.update_instance(self._instance.id, new_status=status)
         except Exception:
@@ -511,6 +623,32 @@ class Plugin(object):
 
         self._logger.debug("Successfully shutdown plugin {0}".format(self.unique_name))
 
+    def _initialize_completed_requests(self):
+        """Create the CompletedRequestCache, if completed requests are remembered"""
+        if self._config.completed_request_cache_size <= 0:
+            return None
+
+        path = self._config.completed_request_cache_path
+        if path:
+            path = os.path.join(self._config.working_directory or "", path)
+
+        return CompletedRequestCache(
+            self._config.completed_request_cache_size, path=path
+        )
+
+    def _initialize_file_cache(self):
+        """Create the FileCache, if file parameters are cached"""
+        if self._config.file_cache_size <= 0:
+            return None
+
+        return FileCache(
+            os.path.join(
+                self._config.working_directory or "", self._config.file_cache_path
+            ),
+            self._config.file_cache_size,
+            spool_size=self._config.download_spool_size,
+        )
+
     def _initialize_logging(self):
         """Configure logging with Beer-garden's configuration for this plugin.
 
@@ -669,21 +807,66 @@ class Plugin(object):
             max_concurrent=1,
             **common_args,
         )
+        # Prefetching more than max_concurrent lets higher priority requests start
+        # ahead of lower priority ones that are waiting for a worker
+        max_prefetch = max(self._config.max_concurrent, self._config.max_prefetch)
+
+        # Adaptive prefetch needs room above the number of workers, otherwise requests
+        # never wait locally and it has nothing to adjust
+        if (
+            self._config.adaptive_prefetch
+            and max_prefetch <= self._config.max_concurrent
+        ):
+            max_prefetch = 2 * self._config.max_concurrent
+            self._logger.warning(
+                "adaptive_prefetch is set but max_prefetch is not above "
+                "max_concurrent, using a max_prefetch of %s",
+                max_prefetch,
+            )
+
+        # Coroutine commands don't occupy a worker thread, so if there are any the
+        # prefetch needs to allow for them as well. Requests for thread commands can
+        # use this prefetch too, which is why max_concurrent_async defaults low.
+        max_async_workers = None
+        if self._has_async_commands():
+            max_async_workers = self._config.max_concurrent_async
+            max_prefetch += max_async_workers
+
+        # Requests held because their command is at its max_concurrent limit stay
+        # unacked, so they get prefetch of their own. Once that many are held the
+        # consumer is paused, so a burst for one command can't use up the prefetch.
+        max_held = None
+        if self._has_limited_commands():
+            max_held = self._config.max_concurrent
+            max_prefetch += max_held
+
         request_consumer = RequestConsumer.create(
             thread_name="Request Consumer",
             queue_name=self._instance.queue_info["request"]["name"],
-            max_concurrent=self._config.max_concurrent,
+            max_concurrent=max_prefetch,
+            adaptive_prefetch=self._config.adaptive_prefetch,
+            min_prefetch=self._config.min_prefetch,
+            parse_workers=self._config.parse_workers,
             **common_args,
         )
 
         # Both RequestProcessors need an updater
-        updater = HTTPRequestUpdater(
-            self._ez_client,
-            self._shutdown_event,
-            max_attempts=self._config.max_attempts,
-            max_timeout=self._config.max_timeout,
-            starting_timeout=self._config.starting_timeout,
-        )
+        updater_args = {
+            "max_attempts": self._config.max_attempts,
+            "max_timeout": self._config.max_timeout,
+            "starting_timeout": self._config.starting_timeout,
+        }
+        if self._config.max_concurrent_updates > 0:
+            updater = QueuedHTTPRequestUpdater(
+                self._ez_client,
+                self._shutdown_event,
+                max_workers=self._config.max_concurrent_updates,
+                **updater_args,
+            )
+        else:
+            updater = HTTPRequestUpdater(
+                self._ez_client, self._shutdown_event, **updater_args
+            )
 
         # Finally, create the actual RequestProcessors
         admin_processor = AdminProcessor(
@@ -700,12 +883,44 @@ class Plugin(object):
             validation_funcs=[self._correct_system, self._is_running],
             plugin_name=self.unique_name,
             max_workers=self._config.max_concurrent,
-            resolver=ResolutionManager(easy_client=self._ez_client),
+            resolver=ResolutionManager(
+                easy_client=self._ez_client, file_cache=self._initialize_file_cache()
+            ),
             system=self._system,
+            max_async_workers=max_async_workers,
+            max_process_workers=self._config.max_process_workers or None,
+            process_start_method=self._config.process_start_method,
+            in_progress_delay=self._config.in_progress_delay / 1000.0,
+            max_output_size=self._config.max_output_size,
+            ez_client=self._ez_client,
+            drain_timeout=(
+                self._config.drain_timeout if self._config.drain_timeout >= 0 else None
+            ),
+            completed_requests=self._initialize_completed_requests(),
+            max_held=max_held,
         )
 
         return admin_processor, request_processor
 
+    def _has_async_commands(self):
+        """Determine if any of the client's commands are coroutine functions"""
+        return any(
+            inspect.iscoroutinefunction(getattr(self._client, command.name, None))
+            for command in self._system.commands
+        )
+
+    def _has_limited_commands(self):
+        """Determine if any of the client's commands have a max_concurrent limit"""
+        return any(
+            isinstance(
+                getattr(
+                    getattr(self._client, command.name, None), "_max_concurrent", None
+                ),
+                int,
+            )
+            for command in self._system.commands
+        )
+
     def _start(self):
         """Handle start Request"""
         self._instance = self._ez_client.update_instance(
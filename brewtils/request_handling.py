@@ -1,22 +1,37 @@
 # -*- coding: utf-8 -*-
 import abc
+import asyncio
+import collections
 import copy
+import heapq
+import inspect
+import itertools
 import json
 import logging
+import multiprocessing
+import queue
 import sys
 import threading
+import time
+from concurrent.futures import Future, wait
+from concurrent.futures.process import BrokenProcessPool, ProcessPoolExecutor
 from concurrent.futures.thread import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
 
 import six
 from requests import ConnectionError as RequestsConnectionError
 
 import brewtils.plugin
+from brewtils import metrics
+from brewtils.cache import ResultCache
 from brewtils.decorators import _parse_method
 from brewtils.errors import (
     BGGivesUpError,
     DiscardMessageException,
     RepublishRequestException,
     RequestProcessingError,
+    RequeueMessageException,
     RestClientError,
     RestConnectionError,
     TooLargeError,
@@ -26,6 +41,32 @@ from brewtils.models import Request
 from brewtils.resolvers.manager import ResolutionManager
 from brewtils.schema_parser import SchemaParser
 
+# Key used in the Request output when the real output was uploaded as a file
+OUTPUT_REFERENCE_KEY = "output_file_id"
+
+# Target object for commands run in a process pool worker, set when the worker starts
+_process_target = None
+
+
+def _initialize_process_worker(target):
+    """Process pool initializer, stores the target in the worker process"""
+    global _process_target
+    _process_target = target
+
+
+def _invoke_in_process(command_name, parameters, context):
+    """Invoke a command in a process pool worker
+
+    Only the command name, its parameters and a minimal Request used as the request
+    context are sent to the worker. The output is formatted in the worker so only a
+    string needs to be sent back to the parent process.
+    """
+    brewtils.plugin.request_context.current_request = context
+
+    output = getattr(_process_target, command_name)(**parameters)
+
+    return RequestProcessor._format_output(output)
+
 
 class LocalRequestProcessor(object):
     """ """
@@ -179,6 +220,42 @@ class RequestProcessor(object):
         logger: A logger
         plugin_name: The Plugin's unique name
         max_workers: Max number of threads to use in the executor pool
+        max_async_workers: Max number of coroutine commands (``async def``) to run
+            concurrently on the processor's event loop. Defaults to 50.
+        max_process_workers: Max number of processes to use for commands with the
+            "process" executor. Defaults to the number of processors on the machine.
+        process_start_method: Multiprocessing start method used for the process pool
+            ("fork", "spawn" or "forkserver"). Defaults to the platform default.
+            Forking a process that's running other threads (like the consumer and
+            worker threads) can deadlock the new worker. "spawn" and "forkserver"
+            avoid that, but need the target to be picklable and the plugin's main
+            module to be importable without starting the plugin.
+        in_progress_delay: Time (seconds) a command must run before the IN_PROGRESS
+            update is sent. Commands that finish sooner only send the final update.
+        max_output_size: Outputs larger than this many bytes are uploaded using the
+            chunked file API and the Request output is replaced with a reference to
+            the uploaded file. Requires ``ez_client``.
+        ez_client: EasyClient used to upload large outputs
+        drain_timeout: Time (seconds) ``shutdown`` waits for running requests to
+            finish. Requests that haven't started are requeued right away. If None
+            ``shutdown`` waits for every received request to finish.
+        completed_requests: CompletedRequestCache used to recognize redelivered
+            messages for requests that already completed. For those the final update
+            is sent again instead of invoking the command.
+        max_held: Max number of requests held because their command is at its
+            ``max_concurrent`` limit. Held requests stay unacked, so once this many
+            are held the consumer is paused until half of them have started, leaving
+            further requests in the queue for other instances instead of using up the
+            prefetch. Requests delivered before the pause takes effect are held too.
+            If None any number can be held.
+
+    Requests waiting for a worker are started in priority order (the AMQP message
+    priority, highest first) and then in the order they were received. This only
+    matters when the consumer prefetches more messages than there are workers.
+
+    A process command holds a worker thread while it waits for its worker process, so
+    no more than ``max_workers`` process commands run at once, whatever the value of
+    ``max_process_workers``.
     """
 
     def __init__(
@@ -192,11 +269,21 @@ class RequestProcessor(object):
         max_workers=None,
         resolver=None,
         system=None,
+        max_async_workers=None,
+        max_process_workers=None,
+        process_start_method=None,
+        in_progress_delay=None,
+        max_output_size=None,
+        ez_client=None,
+        drain_timeout=None,
+        completed_requests=None,
+        max_held=None,
     ):
         self.logger = logger or logging.getLogger(__name__)
 
         self.consumer = consumer
         self.consumer.on_message_callback = self.on_message_received
+        self.consumer.backlog_callback = self.backlog
 
         self._target = target
         self._updater = updater
@@ -204,60 +291,172 @@ class RequestProcessor(object):
         self._validation_funcs = validation_funcs or []
         self._pool = ThreadPoolExecutor(max_workers=max_workers)
 
+        # Work waiting for a worker thread, ordered by priority then arrival
+        self._max_workers = self._pool._max_workers
+        self._running = 0
+        self._waiting = []
+        self._waiting_counter = itertools.count()
+        self._waiting_lock = threading.Lock()
+
         self._resolver = resolver
         self._system = system
+        self._in_progress_delay = in_progress_delay
+        self._max_output_size = max_output_size
+        self._ez_client = ez_client
 
-    def on_message_received(self, message, headers):
+        # Shutdown drain state, running work is tracked so it can be waited on
+        self._drain_timeout = drain_timeout
+        self._draining = False
+        self._drain_requeued = 0
+        self._abandoned = False
+        self._in_flight = set()
+
+        self._completed_requests = completed_requests
+
+        # Command name -> _Dispatch, rebuilt if the target or system commands change
+        self._dispatch = {}
+        self._dispatch_source = (None, None, None)
+
+        # Outputs of commands declared with @command(cache=...), by command name
+        self._result_caches = {}
+        self._result_caches_lock = threading.Lock()
+
+        # When metrics are enabled, the time each request was received
+        self._received_at = {}
+
+        # Requests for commands with a max_concurrent limit are tracked per command
+        self._command_limiters = {}
+        self._command_limiters_lock = threading.Lock()
+        self._max_held = max_held
+        self._held = 0
+        self._consumer_paused = False
+        self._async_command_semaphores = {}
+
+        # Coroutine commands run on a dedicated event loop, created on first use
+        self._max_async_workers = max_async_workers or 50
+        self._async_semaphore = None
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+        # Process commands run in a process pool, created on first use
+        self._max_process_workers = max_process_workers
+        self._process_start_method = process_start_method
+        self._process_pool = None
+        self._process_pool_lock = threading.Lock()
+
+    def on_message_received(self, message, headers, priority=None, redelivered=False):
         """Callback function that will be invoked for received messages
 
         This will attempt to parse the message and then run the parsed Request through
         all validation functions that this RequestProcessor knows about.
 
         If the request parses cleanly and passes validation it will be submitted to this
-        RequestProcessor's ThreadPoolExecutor for processing.
+        RequestProcessor's ThreadPoolExecutor for processing. Requests for coroutine
+        commands (``async def``) are instead scheduled on this RequestProcessor's event
+        loop.
 
         Args:
             message: The message string
             headers: The header dictionary
+            priority: The message priority. Higher priority requests waiting for a
+                worker are started first.
+            redelivered: The message has been delivered before. If the request is
+                known to have completed only its final update is sent again.
 
         Returns:
             A future that will complete when processing finishes
 
         Raises:
             DiscardMessageException: The request failed to parse correctly
+            RequeueMessageException: The RequestProcessor is shutting down
             RequestProcessException: Validation failures should raise a subclass of this
         """
+        if self._draining:
+            raise RequeueMessageException("Plugin is shutting down")
 
         request = self._parse(message)
 
         for func in self._validation_funcs:
             func(request)
 
+        if redelivered:
+            self._restore_completed(request)
+
         # This message has already been processed, all it needs to do is update
         if request.status in Request.COMPLETED_STATUSES:
-            return self._pool.submit(self._updater.update_request, request, headers)
+            return self._submit(
+                priority, self._updater.update_request, request, headers
+            )
+
+        if metrics.enabled:
+            self._received_at[id(request)] = time.monotonic()
+
+        if self._is_async_command(self._target, request):
+            future = self._track(
+                asyncio.run_coroutine_threadsafe(
+                    self.process_message_async(self._target, request, headers),
+                    self._get_event_loop(),
+                )
+            )
+        elif self._command_limit(self._target, request):
+            future = self._submit_limited(request, headers, priority)
         else:
-            return self._pool.submit(
-                self.process_message, self._target, request, headers
+            future = self._submit(
+                priority, self.process_message, self._target, request, headers
             )
 
+        if metrics.enabled:
+            future.add_done_callback(partial(self._forget_received, request))
+
+        return future
+
+    def backlog(self):
+        """Get the number of received requests that are waiting to be processed
+
+        This includes requests waiting for a worker and requests held because their
+        command is at its ``max_concurrent`` limit.
+        """
+        with self._command_limiters_lock:
+            held = sum(len(limiter.held) for limiter in self._command_limiters.values())
+
+        return len(self._waiting) + held
+
     def process_message(self, target, request, headers):
         """Process a message. Intended to be run on an Executor.
 
         Will set the status to IN_PROGRESS, invoke the command, and set the final
         status / output / error_class.
 
+        If this RequestProcessor has an ``in_progress_delay`` the IN_PROGRESS update is
+        only sent if the command is still running once the delay has passed.
+
         Args:
             target: The object to invoke received commands on
             request: The parsed Request
             headers: Dictionary of headers from the `PikaConsumer`
 
         Returns:
-            None
+            The result of the final request update. For a ``QueuedHTTPRequestUpdater``
+            this is a Future that completes once the update has been sent.
         """
 
+        self._record_wait(request)
+
         request.status = "IN_PROGRESS"
-        self._updater.update_request(request, headers)
+        in_progress_timer = None
+
+        if self._in_progress_delay:
+            # A failed update changes its headers, which mustn't affect the final one
+            in_progress_timer = threading.Timer(
+                self._in_progress_delay,
+                self._send_in_progress_update,
+                (copy.copy(request), dict(headers or {})),
+            )
+            in_progress_timer.daemon = True
+            in_progress_timer.start()
+        else:
+            self._updater.update_request(request, headers)
 
         try:
             # Set request context so this request will be the parent of any
@@ -265,37 +464,391 @@ class RequestProcessor(object):
             #  the current plugin.
             brewtils.plugin.request_context.current_request = request
 
-            output = self._invoke_command(target, request, headers)
+            started = time.monotonic()
+            try:
+                output = self._invoke_command(target, request, headers)
+            finally:
+                metrics.COMMAND_DURATION.observe(
+                    time.monotonic() - started, request.command
+                )
 
         except Exception as exc:
             self._handle_invoke_failure(request, exc)
         else:
             self._handle_invoke_success(request, output)
 
-        self._updater.update_request(request, headers)
+        # If the IN_PROGRESS update is being sent let it finish before the final one
+        if in_progress_timer:
+            in_progress_timer.cancel()
+            in_progress_timer.join()
+
+        self._check_abandoned(request)
+
+        self._offload_large_output(request)
+        self._record_completed(request)
+
+        return self._updater.update_request(request, headers)
+
+    async def process_message_async(self, target, request, headers):
+        """Process a message for a coroutine command. Intended to be run on the loop.
+
+        This mirrors ``process_message``, but the command itself is awaited on this
+        RequestProcessor's event loop. Request updates and parameter resolution are
+        blocking, so they are run on the loop's default executor.
+
+        At most ``max_async_workers`` of these will be running at any time, and no
+        more than the command's own ``max_concurrent`` for any one command.
+
+        Args:
+            target: The object to invoke received commands on
+            request: The parsed Request
+            headers: Dictionary of headers from the `PikaConsumer`
+
+        Returns:
+            The result of the final request update
+        """
+        loop = asyncio.get_running_loop()
+
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self._max_async_workers)
+
+        # Requests over the command's own limit wait here, before taking a slot
+        command_limit = self._command_limit(target, request)
+        if command_limit:
+            if request.command not in self._async_command_semaphores:
+                self._async_command_semaphores[request.command] = asyncio.Semaphore(
+                    command_limit
+                )
+
+            async with self._async_command_semaphores[request.command]:
+                async with self._async_semaphore:
+                    return await self._process_async(loop, target, request, headers)
+
+        async with self._async_semaphore:
+            return await self._process_async(loop, target, request, headers)
+
+    async def _process_async(self, loop, target, request, headers):
+        """The body of process_message_async, run while holding its semaphores"""
+        if self._draining:
+            self._drain_requeued += 1
+            raise RequeueMessageException("Plugin is shutting down")
+
+        self._record_wait(request)
+
+        request.status = "IN_PROGRESS"
+        in_progress = {}
+
+        if self._in_progress_delay:
+
+            def send_in_progress(snapshot):
+                in_progress["future"] = loop.run_in_executor(
+                    None, self._send_in_progress_update, snapshot, dict(headers or {})
+                )
+
+            in_progress["handle"] = loop.call_later(
+                self._in_progress_delay, send_in_progress, copy.copy(request)
+            )
+        else:
+            await loop.run_in_executor(
+                None, self._updater.update_request, request, headers
+            )
+
+        try:
+            # Each coroutine command runs in its own task, and so its own context
+            brewtils.plugin.request_context.current_request = request
+
+            started = time.monotonic()
+            try:
+                coroutine = await loop.run_in_executor(
+                    None, self._invoke_command, target, request, headers
+                )
+                output = await coroutine
+            finally:
+                metrics.COMMAND_DURATION.observe(
+                    time.monotonic() - started, request.command
+                )
+
+        except Exception as exc:
+            self._handle_invoke_failure(request, exc)
+        else:
+            self._handle_invoke_success(request, output)
+
+        if "handle" in in_progress:
+            in_progress["handle"].cancel()
+        if "future" in in_progress:
+            await in_progress["future"]
+
+        self._check_abandoned(request)
+
+        if self._max_output_size:
+            await loop.run_in_executor(None, self._offload_large_output, request)
+
+        if self._completed_requests is not None:
+            await loop.run_in_executor(None, self._record_completed, request)
+
+        return await loop.run_in_executor(
+            None, self._updater.update_request, request, headers
+        )
+
+    def _offload_large_output(self, request):
+        """Upload the request output if it's larger than max_output_size
+
+        The output is replaced with a JSON reference to the uploaded file, which can be
+        retrieved with ``EasyClient.download_chunked_file``. If the upload fails the
+        output is left as-is.
+        """
+        if not (self._max_output_size and self._ez_client and request.output):
+            return
+
+        output = request.output.encode("utf-8")
+        if len(output) <= self._max_output_size:
+            return
+
+        try:
+            resolvable = self._ez_client.upload_chunked_file(
+                BytesIO(output), desired_filename="%s-output" % request.id
+            )
+            file_id = resolvable.details["file_id"]
+        except Exception as ex:
+            self.logger.warning(
+                "Unable to upload %s byte output for request %s, sending it inline: %s",
+                len(output),
+                request.id,
+                ex,
+            )
+            return
+
+        request.output = json.dumps(
+            {
+                OUTPUT_REFERENCE_KEY: file_id,
+                "file_name": "%s-output" % request.id,
+                "size": len(output),
+            }
+        )
+
+    def _restore_completed(self, request):
+        """Give a redelivered request its final state, if it's known to have completed
+
+        The connection can drop after a request completes but before its message is
+        acked. Restoring the final state means only the final update is sent again.
+        """
+        if self._completed_requests is None or not request.id:
+            return
+
+        if request.status in Request.COMPLETED_STATUSES:
+            return
+
+        completed = self._completed_requests.get(request.id)
+        if completed:
+            self.logger.info(
+                "Request %s was redelivered after it completed, only sending the final "
+                "update",
+                request.id,
+            )
+            request.status, request.output, request.error_class = completed
+
+    def _record_completed(self, request):
+        """Remember the final state of a completed request"""
+        if self._completed_requests is None or not request.id:
+            return
+
+        try:
+            self._completed_requests.put(
+                request.id, request.status, request.output, request.error_class
+            )
+        except Exception as ex:
+            self.logger.warning(
+                "Unable to record request %s as completed: %s", request.id, ex
+            )
+
+    def _record_wait(self, request):
+        """Record how long a request waited between being received and starting"""
+        received_at = self._received_at.pop(id(request), None)
+
+        if received_at is not None:
+            metrics.REQUEST_WAIT.observe(time.monotonic() - received_at)
+
+    def _forget_received(self, request, future):
+        """Drop the received time of a request that was requeued instead of started
+
+        If the Future has another Future as its result (held work that has since been
+        submitted) the time is kept until that one completes.
+        """
+        if (
+            not future.cancelled()
+            and future.exception() is None
+            and isinstance(future.result(), Future)
+        ):
+            future.result().add_done_callback(partial(self._forget_received, request))
+            return
+
+        self._received_at.pop(id(request), None)
+
+    def _check_abandoned(self, request):
+        """Stop a request that finished after a drain gave up waiting for it
+
+        Its message was requeued when the consumer's connection closed and may already
+        be running elsewhere, so neither the final update nor an ack should be sent.
+
+        Raises:
+            RequeueMessageException: The request was abandoned by a drain
+        """
+        if self._abandoned:
+            self.logger.warning(
+                "Request %s finished after it was abandoned, not sending its final "
+                "update",
+                request.id,
+            )
+            raise RequeueMessageException("Request %s was abandoned" % request.id)
+
+    def _send_in_progress_update(self, request, headers):
+        """Send a deferred IN_PROGRESS update
+
+        The command is already running at this point, so a failure here shouldn't stop
+        the final update from being attempted. The headers must be a copy, since a
+        failed update records its retry attempt in them.
+        """
+        try:
+            self._updater.update_request(request, headers)
+        except Exception as ex:
+            self.logger.warning(
+                "Unable to send IN_PROGRESS update for request %s: %s", request.id, ex
+            )
 
     def startup(self):
         """Start the RequestProcessor"""
         self.consumer.start()
 
     def shutdown(self):
-        """Stop the RequestProcessor"""
+        """Stop the RequestProcessor
+
+        If this RequestProcessor has a ``drain_timeout`` it is drained (see ``drain``)
+        before shutting down.
+
+        Requests abandoned by the drain are not stopped. Python waits for all worker
+        threads before exiting, so the process does not exit until those requests
+        finish, although their results are discarded. The Plugin's ``drain_exit``
+        option exits the process without waiting for them.
+
+        Returns:
+            The drain statistics, if the RequestProcessor was drained
+        """
         self.logger.debug("Shutting down consumer")
         self.consumer.stop_consuming()
 
+        stats = None
+        drained = self._drain_timeout is not None
+        if drained:
+            stats = self.drain(self._drain_timeout)
+
         # Finish all current actions
-        if sys.version_info.major == 3 and sys.version_info.minor >= 9:
+        if drained:
+            # Anything still running was abandoned by the drain
+            self._pool.shutdown(wait=False)
+        elif sys.version_info.major == 3 and sys.version_info.minor >= 9:
             # Only finish requests that are In Progress
             self._pool.shutdown(wait=True, cancel_futures=True)
         else:
             # Finish all requests in the pool
             self._pool.shutdown(wait=True)
 
+        self._stop_event_loop(timeout=0 if drained else None)
+
+        if self._process_pool:
+            self._process_pool.shutdown(wait=not drained)
+
+        # Give the updater a chance to shutdown. This happens before stopping the
+        # consumer so messages waiting on a queued update can still be acked.
+        self._updater.shutdown()
+
         self.consumer.stop()
         self.consumer.join()
 
-        # Give the updater a chance to shutdown
-        self._updater.shutdown()
+        if self._completed_requests is not None:
+            self._completed_requests.close()
+
+        return stats
+
+    def drain(self, timeout):
+        """Stop starting new requests and wait for running ones to finish
+
+        Requests that have been received but not started are requeued so another
+        instance can pick them up immediately. Requests that are still running when the
+        timeout expires are abandoned - their messages are requeued when the consumer's
+        connection is closed. Abandoned requests keep running, but when they finish
+        their final update is not sent and their messages are not acked.
+
+        Args:
+            timeout: Time (seconds) to wait for running requests
+
+        Returns:
+            Dictionary of drain statistics: the number of requests that were
+            "completed" while draining, "requeued" without starting, and "abandoned"
+            at the timeout, along with the drain "duration" in seconds
+        """
+        started = time.monotonic()
+
+        with self._waiting_lock:
+            self._draining = True
+            waiting = [entry[-1] for entry in self._waiting]
+            self._waiting = []
+            in_flight = list(self._in_flight)
+
+        with self._command_limiters_lock:
+            for limiter in self._command_limiters.values():
+                waiting.extend(entry[-1] for entry in limiter.held)
+                limiter.held.clear()
+
+        for future in waiting:
+            future.set_exception(RequeueMessageException("Plugin is shutting down"))
+        self._drain_requeued += len(waiting)
+
+        self.logger.info(
+            "Draining %i running requests, waiting up to %s seconds",
+            len(in_flight),
+            timeout,
+        )
+        done, not_done = wait(in_flight, timeout=timeout)
+
+        if not_done:
+            self._abandoned = True
+
+        stats = {
+            "completed": len(
+                [
+                    future
+                    for future in done
+                    if not future.cancelled()
+                    and not isinstance(future.exception(), RequeueMessageException)
+                ]
+            ),
+            "requeued": self._drain_requeued,
+            "abandoned": len(not_done),
+            "duration": time.monotonic() - started,
+        }
+
+        self.logger.info(
+            "Drain finished in %.2f seconds: %i completed, %i requeued, %i abandoned",
+            stats["duration"],
+            stats["completed"],
+            stats["requeued"],
+            stats["abandoned"],
+        )
+
+        return stats
+
+    def _track(self, future):
+        """Track a Future for running work so that a drain can wait for it"""
+        with self._waiting_lock:
+            self._in_flight.add(future)
+
+        future.add_done_callback(self._untrack)
+
+        return future
+
+    def _untrack(self, future):
+        with self._waiting_lock:
+            self._in_flight.discard(future)
 
     def _handle_invoke_success(self, request, output):
         request.status = "SUCCESS"
@@ -314,6 +867,257 @@ class RequestProcessor(object):
         request.output = self._format_error_output(request, exc)
         request.error_class = type(exc).__name__
 
+    @staticmethod
+    def _command_limit(target, request):
+        """Get the max_concurrent limit of the command named in the request, if any"""
+        if not isinstance(request.command, six.string_types):
+            return None
+
+        limit = getattr(getattr(target, request.command, None), "_max_concurrent", None)
+
+        return limit if isinstance(limit, int) else None
+
+    def _submit(self, priority, fn, *args):
+        """Submit work to the pool, or hold it until a worker is free
+
+        The Future returned for held work will have the real Future as its result once
+        the work is submitted.
+        """
+        with self._waiting_lock:
+            if self._draining:
+                self._drain_requeued += 1
+                future = Future()
+                future.set_exception(RequeueMessageException("Plugin is shutting down"))
+                return future
+
+            if self._running >= self._max_workers:
+                future = Future()
+                heapq.heappush(
+                    self._waiting,
+                    (-(priority or 0), next(self._waiting_counter), fn, args, future),
+                )
+                return future
+
+            self._running += 1
+
+        return self._submit_to_pool(fn, args)
+
+    def _submit_to_pool(self, fn, args):
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release_worker)
+
+        with self._waiting_lock:
+            if not future.done():
+                self._in_flight.add(future)
+
+        return future
+
+    def _release_worker(self, future):
+        """Start the highest priority waiting work, or release the worker"""
+        with self._waiting_lock:
+            self._in_flight.discard(future)
+
+            if not self._waiting:
+                self._running -= 1
+                return
+
+            _, _, fn, args, held_future = heapq.heappop(self._waiting)
+
+        try:
+            held_future.set_result(self._submit_to_pool(fn, args))
+        except RuntimeError:
+            # The pool has been shut down. Leaving the message unacked means it will be
+            # redelivered once the consumer's connection closes.
+            self.logger.debug("Unable to start waiting work %s", fn)
+
+    def _submit_limited(self, request, headers, priority):
+        """Submit a request for a command with a max_concurrent limit
+
+        If the command is already at its limit the request is held, without using a
+        worker, until a running request for that command finishes. The Future returned
+        for a held request will have the real processing Future as its result once
+        the request is submitted.
+        """
+        with self._command_limiters_lock:
+            limiter = self._command_limiters.get(request.command)
+            if limiter is None:
+                limiter = _CommandLimiter(self._command_limit(self._target, request))
+                self._command_limiters[request.command] = limiter
+
+            if limiter.running >= limiter.limit:
+                future = Future()
+
+                self._held += 1
+                limiter.held.append((request, headers, priority, future))
+
+                # Requeuing or republishing the excess would just have it delivered
+                # again, so stop deliveries until some held requests have started
+                if (
+                    self._max_held is not None
+                    and self._held >= self._max_held
+                    and not self._consumer_paused
+                ):
+                    self.logger.debug(
+                        "Holding %i requests, pausing the consumer", self._held
+                    )
+                    self._consumer_paused = True
+                    self.consumer.pause_consuming()
+
+                return future
+
+            limiter.running += 1
+
+        return self._submit_with_limiter(limiter, request, headers, priority)
+
+    def _submit_with_limiter(self, limiter, request, headers, priority):
+        return self._submit(
+            priority, self._process_limited, limiter, self._target, request, headers
+        )
+
+    def _process_limited(self, limiter, target, request, headers):
+        try:
+            return self.process_message(target, request, headers)
+        finally:
+            self._release_limiter(limiter)
+
+    def _release_limiter(self, limiter):
+        """Start the next held request for a command, or release its slot"""
+        with self._command_limiters_lock:
+            if not limiter.held:
+                limiter.running -= 1
+                return
+
+            request, headers, priority, held_future = limiter.held.popleft()
+            self._held -= 1
+
+            if (
+                self._consumer_paused
+                and self._held <= self._max_held // 2
+                and not self._draining
+            ):
+                self.logger.debug(
+                    "Holding %i requests, resuming the consumer", self._held
+                )
+                self._consumer_paused = False
+                self.consumer.resume_consuming()
+
+        try:
+            held_future.set_result(
+                self._submit_with_limiter(limiter, request, headers, priority)
+            )
+        except RuntimeError:
+            # The pool has been shut down. Leaving the message unacked means it will be
+            # redelivered once the consumer's connection closes.
+            self.logger.debug("Unable to start held request %s", request.id)
+
+    @staticmethod
+    def _is_async_command(target, request):
+        """Determine if the command named in the request is a coroutine function"""
+        if not request.command:
+            return False
+
+        return inspect.iscoroutinefunction(getattr(target, request.command, None))
+
+    def _get_event_loop(self):
+        """Get the event loop used for coroutine commands, starting it if necessary"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._run_event_loop, name="Request Event Loop"
+                )
+                self._loop_thread.daemon = True
+                self._loop_thread.start()
+
+        return self._loop
+
+    def _get_process_pool(self):
+        """Get the process pool used for process commands, creating it if necessary"""
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self._max_process_workers,
+                    mp_context=(
+                        multiprocessing.get_context(self._process_start_method)
+                        if self._process_start_method
+                        else None
+                    ),
+                    initializer=_initialize_process_worker,
+                    initargs=(self._target,),
+                )
+
+        return self._process_pool
+
+    def _invoke_in_process_pool(self, request, parameters):
+        """Invoke a command in the process pool
+
+        The worker only gets the command name and the resolved parameters, along with
+        a Request carrying just the fields needed to be the parent of any requests the
+        command makes.
+
+        If a worker process dies the pool can't be used again, so it's discarded and
+        the next process command gets a new one.
+        """
+        pool = self._get_process_pool()
+
+        try:
+            return pool.submit(
+                _invoke_in_process,
+                request.command,
+                parameters,
+                Request(
+                    id=request.id,
+                    command=request.command,
+                    requester=request.requester,
+                ),
+            ).result()
+        except BrokenProcessPool:
+            with self._process_pool_lock:
+                if self._process_pool is pool:
+                    self._process_pool = None
+
+            pool.shutdown(wait=False)
+            raise
+
+    def _run_event_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _stop_event_loop(self, timeout=None):
+        """Let any running coroutine commands finish, then stop the event loop
+
+        Args:
+            timeout: Time (seconds) to wait for coroutine commands before cancelling
+                them. If None wait for all of them to finish.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                return
+
+            self.logger.debug("Waiting for coroutine commands to finish")
+            asyncio.run_coroutine_threadsafe(
+                self._wait_for_tasks(timeout), self._loop
+            ).result()
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+
+    @staticmethod
+    async def _wait_for_tasks(timeout=None):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+
+        if tasks and timeout != 0:
+            _, tasks = await asyncio.wait(tasks, timeout=timeout)
+
+        for task in tasks:
+            task.cancel()
+
+        if tasks:
+            await asyncio.wait(tasks)
+
     def _parse(self, message):
         """Parse a message using the standard SchemaParser
 
@@ -349,28 +1153,115 @@ class RequestProcessor(object):
             RequestProcessingError: The specified target does not define a
                 callable implementation of request.command
         """
-        if not callable(getattr(target, request.command, None)):
-            raise RequestProcessingError(
-                "Could not find an implementation of command '%s'" % request.command
-            )
+        dispatch = self._get_dispatch(target).get(request.command)
 
-        # Get the command to use the parameter definitions when resolving
-        command = None
-        if self._system:
-            command = self._system.get_command_by_name(request.command)
+        if dispatch:
+            method, command = dispatch.method, dispatch.command
+        else:
+            # Every system command with an implementation is in the dispatch table,
+            # so anything else can only be an undefined (or uncallable) command
+            method = getattr(target, request.command, None)
+            command = None
+
+            if not callable(method):
+                raise RequestProcessingError(
+                    "Could not find an implementation of command '%s'" % request.command
+                )
 
         # Now resolve parameters, if necessary
         if request.is_ephemeral or not command:
             parameters = request.parameters or {}
         else:
+            # Resolvers without compile() don't take a plan either
+            plan_args = {}
+            if hasattr(self._resolver, "compile"):
+                plan_args["plan"] = self._get_plan(dispatch)
+
             parameters = self._resolver.resolve(
                 request.parameters,
                 definitions=command.parameters,
                 upload=False,
                 allow_any_parameter=command.allow_any_kwargs,
+                **plan_args
             )
 
-        return getattr(target, request.command)(**parameters)
+        # Commands declared with a cache can skip invocation for repeated parameters
+        cache = self._get_result_cache(request.command, method)
+        key = ResultCache.make_key(parameters) if cache is not None else None
+        if key:
+            hit, output = cache.get(key)
+            if hit:
+                metrics.CACHE_HITS.inc(request.command)
+                return output
+
+            metrics.CACHE_MISSES.inc(request.command)
+
+        # The worker thread waits on the process so the request flow is unchanged
+        if getattr(method, "_executor", None) == "process":
+            output = self._invoke_in_process_pool(request, parameters)
+        else:
+            output = method(**parameters)
+
+        if key:
+            cache.put(key, output)
+
+        return output
+
+    def _get_dispatch(self, target):
+        """Get the dispatch table for a target
+
+        The table maps each system command name to the target's implementation and
+        the Command, so invoking a command doesn't need to search the system's
+        commands. It's built the first time it's needed and again only if the target,
+        the system or the system's commands are replaced. Each command's parameter
+        resolution plan is compiled by ``_get_plan`` the first time it's resolved.
+
+        Args:
+            target: The object that implements the commands
+
+        Returns:
+            Dictionary of command name to _Dispatch
+        """
+        commands = self._system.commands if self._system else None
+        source = (target, self._system, commands)
+
+        if any(a is not b for a, b in zip(source, self._dispatch_source)):
+            dispatch = {}
+
+            for command in commands or []:
+                method = getattr(target, command.name, None)
+
+                # Keep the first command with a name, like get_command_by_name
+                if callable(method) and command.name not in dispatch:
+                    dispatch[command.name] = _Dispatch(method, command)
+
+            self._dispatch, self._dispatch_source = dispatch, source
+
+        return self._dispatch
+
+    def _get_plan(self, dispatch):
+        """Get the parameter resolution plan for a command, compiling it if necessary
+
+        The plan only depends on the Command, so compiling it twice is harmless.
+        """
+        if dispatch.plan is None:
+            dispatch.plan = self._resolver.compile(
+                dispatch.command.parameters, upload=False
+            )
+
+        return dispatch.plan
+
+    def _get_result_cache(self, command_name, method):
+        """Get the ResultCache for a command, or None if its output isn't cached"""
+        options = getattr(method, "_cache", None)
+        if not isinstance(options, dict):
+            return None
+
+        with self._result_caches_lock:
+            if command_name not in self._result_caches:
+                self._result_caches[command_name] = ResultCache(**options)
+
+            return self._result_caches[command_name]
 
     @staticmethod
     def _format_error_output(request, exc):
@@ -406,8 +1297,10 @@ class AdminProcessor(RequestProcessor):
             headers: Dictionary of headers from the `PikaConsumer`
 
         Returns:
-            None
+            The result of the request update
         """
+        self._record_wait(request)
+
         try:
             output = self._invoke_command(target, request, headers)
         except Exception as exc:
@@ -415,7 +1308,7 @@ class AdminProcessor(RequestProcessor):
         else:
             self._handle_invoke_success(request, output)
 
-        self._updater.update_request(request, headers)
+        return self._updater.update_request(request, headers)
 
 
 @six.add_metaclass(abc.ABCMeta)
@@ -430,19 +1323,38 @@ class RequestConsumer(threading.Thread):
     correct method.
 
     This means when the consumer receives a message it should invoke its own
-    ``_on_message_callback`` method with the message body and headers as parameters::
+    ``_on_message_callback`` method with the message body, headers, priority and
+    redelivered flag::
+
+        self._on_message_callback(
+            body,
+            properties.headers,
+            priority=properties.priority,
+            redelivered=basic_deliver.redelivered,
+        )
 
-        self._on_message_callback(body, properties.headers)
+    The processor also sets the ``backlog_callback`` property, which returns the
+    number of received requests that are waiting for a worker.
 
+    Consumers that can stop and restart deliveries without closing their connection
+    should implement ``pause_consuming`` and ``resume_consuming``. The processor calls
+    them while it's holding as many requests as it's allowed to.
     """
 
     def __init__(self, *args, **kwargs):
         super(RequestConsumer, self).__init__(*args, **kwargs)
         self._on_message_callback = None
+        self._backlog_callback = None
 
     def stop_consuming(self):
         pass
 
+    def pause_consuming(self):
+        pass
+
+    def resume_consuming(self):
+        pass
+
     def stop(self):
         pass
 
@@ -454,6 +1366,14 @@ class RequestConsumer(threading.Thread):
     def on_message_callback(self, new_callback):
         self._on_message_callback = new_callback
 
+    @property
+    def backlog_callback(self):
+        return self._backlog_callback
+
+    @backlog_callback.setter
+    def backlog_callback(self, new_callback):
+        self._backlog_callback = new_callback
+
     @staticmethod
     def create(connection_type=None, **kwargs):
         """Factory method for consumer creation
@@ -568,36 +1488,47 @@ class HTTPRequestUpdater(RequestUpdater):
             sys.stdout.flush()
             return
 
+        # Only hold the condition while waiting, so updates aren't serialized
         with self.beergarden_error_condition:
             self._wait_for_beergarden_if_down(request)
 
-            try:
-                if not self._should_be_final_attempt(headers):
-                    self._wait_if_not_first_attempt(headers)
-                    self._ez_client.update_request(
-                        request.id,
-                        status=request.status,
-                        output=request.output,
-                        error_class=request.error_class,
-                    )
-                else:
-                    self._ez_client.update_request(
-                        request.id,
-                        status="ERROR",
-                        output="We tried to update the request, but it failed too many "
-                        "times. Please check the plugin logs to figure out why the "
-                        "request update failed. It is possible for this request to "
-                        "have succeeded, but we cannot update beer-garden with that "
-                        "information.",
-                        error_class="BGGivesUpError",
-                    )
-            except Exception as ex:
-                self._handle_request_update_failure(request, headers, ex)
-            finally:
-                sys.stdout.flush()
+        try:
+            if not self._should_be_final_attempt(headers):
+                self._wait_if_not_first_attempt(headers)
+                self._send_update(
+                    request.id,
+                    status=request.status,
+                    output=request.output,
+                    error_class=request.error_class,
+                )
+            else:
+                self._send_update(
+                    request.id,
+                    status="ERROR",
+                    output="We tried to update the request, but it failed too many "
+                    "times. Please check the plugin logs to figure out why the "
+                    "request update failed. It is possible for this request to "
+                    "have succeeded, but we cannot update beer-garden with that "
+                    "information.",
+                    error_class="BGGivesUpError",
+                )
+        except Exception as ex:
+            self._handle_request_update_failure(request, headers, ex)
+        finally:
+            sys.stdout.flush()
+
+    def _send_update(self, request_id, **kwargs):
+        started = time.monotonic()
+        try:
+            self._ez_client.update_request(request_id, **kwargs)
+        finally:
+            metrics.UPDATE_DURATION.observe(
+                time.monotonic() - started, kwargs.get("status")
+            )
 
     def _wait_if_not_first_attempt(self, headers):
         if headers.get("retry_attempt", 0) > 0:
+            metrics.UPDATE_RETRIES.inc()
             time_to_sleep = min(
                 headers.get("time_to_wait", self.starting_timeout), self.max_timeout
             )
@@ -706,3 +1637,193 @@ class HTTPRequestUpdater(RequestUpdater):
                             self.beergarden_error_condition.notify_all()
             except Exception as ex:
                 self.logger.exception("Exception in connection poll thread: %s", ex)
+
+
+class QueuedHTTPRequestUpdater(HTTPRequestUpdater):
+    """HTTPRequestUpdater that sends updates from background threads
+
+    Updates are put on a queue and ``update_request`` returns immediately with a
+    Future that completes when the update has been sent (or has failed, in which case
+    the Future will have the same exception ``HTTPRequestUpdater`` would raise). The
+    ``PikaConsumer`` waits on this Future before acking the message.
+
+    Updates are coalesced per request. If an update for a request is still waiting to
+    be sent when a newer one arrives the newer one replaces it, and a pending final
+    update is never replaced by a non-final one. Updates for a single request are
+    never sent concurrently.
+
+    Retries of a republished update back off on the thread calling ``update_request``
+    before they're queued, so the flusher threads are never asleep while other
+    updates are waiting.
+
+    Nothing waits on a non-final (``IN_PROGRESS``) update, and the final update that
+    follows decides what happens to the message, so a failed non-final update is
+    only logged. Its Future completes without an exception.
+
+    Args:
+        ez_client: EasyClient to use for communication
+        shutdown_event: `threading.Event` to allow for timely shutdowns
+
+    Keyword Args:
+        max_workers: Max number of updates to send concurrently
+        See ``HTTPRequestUpdater`` for the remaining keyword arguments
+
+    """
+
+    def __init__(self, ez_client, shutdown_event, **kwargs):
+        super(QueuedHTTPRequestUpdater, self).__init__(
+            ez_client, shutdown_event, **kwargs
+        )
+
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._in_flight = set()
+        self._pending_lock = threading.Lock()
+
+        self._flusher_threads = []
+        for i in range(kwargs.get("max_workers", 4)):
+            flusher = threading.Thread(
+                target=self._flush, name="Request Updater %d" % i
+            )
+            flusher.daemon = True
+            flusher.start()
+
+            self._flusher_threads.append(flusher)
+
+    def shutdown(self):
+        """Wait for queued updates to be sent
+
+        Flusher threads waiting for Beer-garden to come back are woken until the queue
+        is empty, so they make their final attempt instead of waiting forever. The
+        shutdown event should already be set, so they don't wait again.
+        """
+        self.logger.debug("Waiting for queued request updates to be sent")
+
+        while True:
+            super(QueuedHTTPRequestUpdater, self).shutdown()
+
+            with self._queue.all_tasks_done:
+                if not self._queue.unfinished_tasks:
+                    return
+
+                self._queue.all_tasks_done.wait(1)
+
+    def update_request(self, request, headers):
+        """Queue a Request update to be sent to beer-garden
+
+        Args:
+            request: The request to update
+            headers: A dictionary of headers from the `PikaConsumer`
+
+        Returns:
+            A Future that completes when the update has been sent
+        """
+        future = Future()
+
+        if request.is_ephemeral:
+            future.set_result(None)
+            return future
+
+        if not self._should_be_final_attempt(headers):
+            super(QueuedHTTPRequestUpdater, self)._wait_if_not_first_attempt(headers)
+
+        # Request is mutated during processing, so hold on to a snapshot. A failed
+        # update records its retry attempt in its headers, so those are copied too.
+        update = _QueuedUpdate(copy.copy(request), dict(headers or {}), future)
+        superseded = None
+
+        with self._pending_lock:
+            existing = self._pending.get(request.id)
+
+            if existing is None:
+                self._pending[request.id] = update
+
+                if request.id not in self._in_flight:
+                    self._queue.put(request.id)
+            elif existing.is_final and not update.is_final:
+                superseded = update
+            else:
+                self._pending[request.id] = update
+                superseded = existing
+
+        # Updates that will never be sent are treated as successful
+        if superseded:
+            superseded.future.set_result(None)
+
+        return future
+
+    def _wait_if_not_first_attempt(self, headers):
+        """Flusher threads don't wait, update_request already backed off"""
+
+    def _flush(self):
+        """Send queued updates until the process exits"""
+        while True:
+            request_id = self._queue.get()
+
+            try:
+                with self._pending_lock:
+                    update = self._pending.pop(request_id, None)
+                    if update is None:
+                        continue
+
+                    self._in_flight.add(request_id)
+
+                try:
+                    super(QueuedHTTPRequestUpdater, self).update_request(
+                        update.request, update.headers
+                    )
+                except Exception as ex:
+                    if update.is_final:
+                        update.future.set_exception(ex)
+                    else:
+                        self.logger.warning(
+                            "Unable to send %s update for request %s: %s",
+                            update.request.status,
+                            request_id,
+                            ex,
+                        )
+                        update.future.set_result(None)
+                else:
+                    update.future.set_result(None)
+                finally:
+                    with self._pending_lock:
+                        self._in_flight.discard(request_id)
+
+                        # A newer update arrived while this one was being sent
+                        if request_id in self._pending:
+                            self._queue.put(request_id)
+            except Exception as ex:
+                self.logger.exception("Exception in request updater thread: %s", ex)
+            finally:
+                self._queue.task_done()
+
+
+class _QueuedUpdate(object):
+    """A request update waiting to be sent by a QueuedHTTPRequestUpdater"""
+
+    def __init__(self, request, headers, future):
+        self.request = request
+        self.headers = headers
+        self.future = future
+
+    @property
+    def is_final(self):
+        return self.request.status in Request.COMPLETED_STATUSES
+
+
+class _CommandLimiter(object):
+    """Tracks running and held requests for a command with a max_concurrent limit"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.running = 0
+        self.held = collections.deque()
+
+
+class _Dispatch(object):
+    """How to invoke a system command: its implementation, definition and plan"""
+
+    def __init__(self, method, command, plan=None):
+        self.method = method
+        self.command = command
+        self.plan = plan
@@ -27,3 +27,21 @@ class ResolverBase(object):
     def download(self, value, definition):
         # type: (Resolvable, Parameter) -> Any
         pass
+
+    def may_upload(self, definition):
+        # type: (Parameter) -> bool
+        """Determine if should_upload could be True for any value of a parameter
+
+        Used to skip parameters that can never need resolving. The default is the
+        safe answer, True.
+        """
+        return True
+
+    def may_download(self, definition):
+        # type: (Parameter) -> bool
+        """Determine if download could change the value of a parameter
+
+        Used to skip parameters that can never need resolving. The default is the
+        safe answer, True.
+        """
+        return True
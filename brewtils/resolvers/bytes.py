@@ -1,13 +1,24 @@
 # -*- coding: utf-8 -*-
 
+import io
+
 from brewtils.resolvers import ResolverBase
 
 
 class BytesResolver(ResolverBase):
-    """Resolver that uses the Beergarden file API"""
+    """Resolver that uses the Beergarden file API
+
+    If a definition specifies "lazy": True as part of the type_info dictionary the
+    command is passed a read-only file object instead, and data is only downloaded
+    as the command reads it.
+
+    Otherwise, if there's a ``file_cache`` (a ``brewtils.cache.FileCache``), it's
+    checked before downloading and downloaded data is added to it.
+    """
 
-    def __init__(self, easy_client):
+    def __init__(self, easy_client, file_cache=None):
         self.easy_client = easy_client
+        self.file_cache = file_cache
 
     def should_upload(self, value, definition):
         return definition.type.lower() == "bytes"
@@ -18,5 +29,25 @@ class BytesResolver(ResolverBase):
     def should_download(self, value, definition):
         return definition.type.lower() == "bytes"
 
+    def may_upload(self, definition):
+        return (definition.type or "").lower() == "bytes"
+
+    def may_download(self, definition):
+        return (definition.type or "").lower() == "bytes"
+
     def download(self, value, definition):
-        return self.easy_client.download_bytes(value.id)
+        if definition.type_info.get("lazy"):
+            return self.easy_client.open_bytes(value.id)
+
+        if self.file_cache is None:
+            return self.easy_client.download_bytes(value.id)
+
+        cached = self.file_cache.get(value.id)
+        if cached is not None:
+            with cached:
+                return cached.read()
+
+        data = self.easy_client.download_bytes(value.id)
+        self.file_cache.put(value.id, io.BytesIO(data))
+
+        return data
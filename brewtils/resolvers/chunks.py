@@ -9,10 +9,19 @@ from brewtils.resolvers import ResolverBase
 
 
 class ChunksResolver(ResolverBase):
-    """Resolver that uses the Beergarden chunks API"""
+    """Resolver that uses the Beergarden chunks API
 
-    def __init__(self, easy_client):
+    If a definition specifies "lazy": True as part of the type_info dictionary the
+    command is passed a read-only file object instead, and data is only downloaded
+    as the command reads it.
+
+    Otherwise, if there's a ``file_cache`` (a ``brewtils.cache.FileCache``), it's
+    checked before downloading and downloaded files are added to it.
+    """
+
+    def __init__(self, easy_client, file_cache=None):
         self.easy_client = easy_client
+        self.file_cache = file_cache
 
     def should_upload(self, value, definition):
         """
@@ -38,5 +47,24 @@ class ChunksResolver(ResolverBase):
     def should_download(self, value, definition):
         return definition.type.lower() == "base64"
 
+    def may_upload(self, definition):
+        return (definition.type or "").lower() == "base64"
+
+    def may_download(self, definition):
+        return (definition.type or "").lower() == "base64"
+
     def download(self, value, definition):
-        return self.easy_client.download_chunked_file(value.id)
+        if definition.type_info.get("lazy"):
+            return self.easy_client.open_chunked_file(value.id)
+
+        if self.file_cache is not None:
+            cached = self.file_cache.get(value.id)
+            if cached is not None:
+                return cached
+
+        file_obj = self.easy_client.download_chunked_file(value.id)
+
+        if self.file_cache is not None:
+            self.file_cache.put(value.id, file_obj)
+
+        return file_obj
@@ -25,6 +25,10 @@ class IdentityResolver(ResolverBase):
     def upload(self, value, definition):
         return value
 
+    def may_download(self, definition):
+        # Downloading returns the value unchanged
+        return False
+
     def should_download(self, value, definition):
         return definition.type_info.get("autoresolve") is False
 
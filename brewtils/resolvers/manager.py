@@ -16,16 +16,34 @@ from brewtils.resolvers.identity import IdentityResolver
 from brewtils.schema_parser import SchemaParser
 
 
-def build_resolver_map(easy_client=None):
+def build_resolver_map(easy_client=None, file_cache=None):
     """Builds all resolvers"""
 
     return [
         IdentityResolver(),  # This should always be first
-        BytesResolver(easy_client),
-        ChunksResolver(easy_client),
+        BytesResolver(easy_client, file_cache=file_cache),
+        ChunksResolver(easy_client, file_cache=file_cache),
     ]
 
 
+class ResolutionPlan(object):
+    """Parameter definitions compiled by ``ResolutionManager.compile``
+
+    Attributes:
+        entries: Dictionary of parameter key to a tuple of the Parameter definition,
+            the ResolutionPlan for its nested parameters (or None) and whether any
+            resolver could need to resolve its value
+        resolvable: True if any parameter, not including nested parameters, could
+            need resolving
+        nested: True if any parameter has nested parameters
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.resolvable = any(entry[2] for entry in entries.values())
+        self.nested = any(entry[1] is not None for entry in entries.values())
+
+
 class ResolutionManager(object):
     """Parameter resolution manager
 
@@ -43,8 +61,56 @@ class ResolutionManager(object):
         self.logger = logging.getLogger(__name__)
         self.resolvers = build_resolver_map(**kwargs)
 
-    def resolve(self, values, definitions=None, upload=True, allow_any_parameter=False):
-        # type: (Mapping[str, Any], List[Parameter], bool, bool) -> Dict[str, Any]
+    def compile(self, definitions, upload=True):
+        # type: (List[Parameter], bool) -> ResolutionPlan
+        """Build a resolution plan for a list of parameter definitions
+
+        The plan maps each parameter key to its definition, the plan for its nested
+        parameters and whether any resolver could need to resolve its value. Passing
+        it to ``resolve`` avoids searching the definitions for every value and
+        skips the resolvers for parameters that can never need resolving.
+
+        Args:
+            definitions: Parameter definitions
+            upload: The direction the plan will be used for. Must match the
+                ``upload`` passed to ``resolve``.
+
+        Returns:
+            The resolution plan
+        """
+        entries = {}
+
+        for definition in definitions or []:
+            # Keep the first definition for a key, like a linear search would
+            if definition.key in entries:
+                continue
+
+            if upload:
+                may_resolve = any(r.may_upload(definition) for r in self.resolvers)
+            else:
+                may_resolve = any(r.may_download(definition) for r in self.resolvers)
+
+            entries[definition.key] = (
+                definition,
+                (
+                    self.compile(definition.parameters, upload=upload)
+                    if definition.parameters
+                    else None
+                ),
+                may_resolve,
+            )
+
+        return ResolutionPlan(entries)
+
+    def resolve(
+        self,
+        values,
+        definitions=None,
+        upload=True,
+        allow_any_parameter=False,
+        plan=None,
+    ):
+        # type: (Mapping[str, Any], List[Parameter], bool, bool, Any) -> Dict[str, Any]
         """Iterate through parameters, resolving as necessary
 
         Args:
@@ -52,27 +118,45 @@ class ResolutionManager(object):
             definitions: Parameter definitions
             upload: Controls which methods will be called on resolvers
             allow_any_parameter: Controls if any KWARG value is supported by command
+            plan: Resolution plan from ``compile``, used instead of ``definitions``
 
         Returns:
             The resolved parameter dict
         """
+        if plan is None:
+            plan = self.compile(definitions, upload=upload)
+
+        return self._resolve(values, plan, upload, allow_any_parameter)
+
+    def _resolve(self, values, plan, upload, allow_any_parameter):
+        # Nothing can need resolving, so only the keys need to be checked
+        if not plan.resolvable and not plan.nested:
+            if not allow_any_parameter:
+                for key in values:
+                    if key not in plan.entries:
+                        raise RequestProcessException(
+                            f"Unable to map key '{key}' to command parameter"
+                        )
+
+            return dict(values)
+
         resolved_parameters = {}
 
         for key, value in values.items():
             # First find the matching Parameter definition, if possible
-            definition = None
+            definition, nested_plan, may_resolve = plan.entries.get(
+                key, (None, None, False)
+            )
             resolved = None
-            for param_def in definitions or []:
-                if param_def.key == key:
-                    definition = param_def
-                    break
 
-            if definition:
+            if definition and not may_resolve and nested_plan is None:
+                # A simple parameter that no resolver handles
+                resolved = value
+
+            elif definition:
                 # Check to see if this is a nested parameter
-                if isinstance(value, CollectionsMapping) and definition.parameters:
-                    resolved = self.resolve(
-                        value, definitions=definition.parameters, upload=upload
-                    )
+                if isinstance(value, CollectionsMapping) and nested_plan:
+                    resolved = self._resolve(value, nested_plan, upload, False)
 
                 # See if this is a multi parameter
                 elif isinstance(value, list):
@@ -81,9 +165,7 @@ class ResolutionManager(object):
                     resolved = []
 
                     for item in value:
-                        resolved_item = self.resolve(
-                            {key: item}, definitions=definitions, upload=upload
-                        )
+                        resolved_item = self._resolve({key: item}, plan, upload, False)
                         resolved.append(resolved_item[key])
 
                 # This is a simple parameter
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import collections
 import functools
+import io
 import json
+import mmap
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, List
 
 import requests.exceptions
@@ -48,6 +52,49 @@ def enable_auth(method):
     return wrapper
 
 
+def _map_file(fd):
+    """Memory-map a binary file for reading
+
+    Returns:
+        The mapping, or None if the file can't be mapped (it's in memory, a pipe,
+        opened in text mode or empty)
+    """
+    if isinstance(fd, io.TextIOBase):
+        return None
+
+    try:
+        return mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, TypeError, ValueError, OSError):
+        return None
+
+
+def _encoded_chunks(fd, chunk_size):
+    """Read a file from its current position as base64 encoded chunks
+
+    Files that can be memory-mapped are encoded straight from the mapping, so each
+    chunk isn't first copied into a new bytes object.
+    """
+    position = fd.tell()
+    mapped = _map_file(fd)
+
+    if mapped is None:
+        while True:
+            data = fd.read(chunk_size)
+            if not data:
+                return
+            if type(data) is not bytes:
+                data = bytes(data, "utf-8")
+            yield b64encode(data)
+
+    try:
+        with memoryview(mapped) as view:
+            for start in range(position, len(view), chunk_size):
+                with view[start : start + chunk_size] as chunk:
+                    yield b64encode(chunk)
+    finally:
+        mapped.close()
+
+
 class TimeoutAdapter(HTTPAdapter):
     """Transport adapter with a default request timeout"""
 
@@ -824,13 +871,15 @@ class RestClient(object):
         return self.session.delete(self.chunk_url + "?file_id=" + file_id, **kwargs)
 
     @enable_auth
-    def post_chunked_file(self, fd, file_params, current_position=0):
+    def post_chunked_file(self, fd, file_params, current_position=0, workers=1):
         """Performs a POST on the file URL.
 
         Args:
             fd: A file descriptor
             file_params: Metadata about the file
             current_position: The current cursor position for the file object
+            workers: Number of chunks to send concurrently. The file is still read
+                in order, and each chunk is retried on its own.
 
         Returns:
             A Requests Response object
@@ -848,37 +897,51 @@ class RestClient(object):
             raise RuntimeError("Could not request file ID for file %s" % fd.name)
 
         file_id = result.json()["details"]["file_id"]
-        offset = 0
-        retry = 0
+
+        chunks = _encoded_chunks(fd, file_params["chunk_size"])
 
         # Break up the file into chunks and send them
-        while True:
-            current_cursor = fd.tell()
-            data = fd.read(file_params["chunk_size"])
-            if not data:
-                break
-            if type(data) is not bytes:
-                data = bytes(data, "utf-8")
-            data = b64encode(data)
+        try:
+            if workers <= 1:
+                for offset, data in enumerate(chunks):
+                    self._post_chunk(file_id, offset, data)
+            else:
+                # Only a few chunks are read ahead of the ones being sent, so memory
+                # use stays at about one chunk per worker
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    pending = collections.deque()
+
+                    for offset, data in enumerate(chunks):
+                        pending.append(
+                            pool.submit(self._post_chunk, file_id, offset, data)
+                        )
+
+                        if len(pending) >= workers:
+                            pending.popleft().result()
+
+                    for future in pending:
+                        future.result()
+        finally:
+            chunks.close()
+
+        return result
+
+    def _post_chunk(self, file_id, offset, data, retries=3):
+        """Send one chunk of a chunked file
+
+        Allow the system to try to resend the chunk a couple of times before giving
+        up.
+        """
+        for _ in range(retries + 1):
             chunk_result = self.session.post(
                 self.chunk_url + "?file_id=" + file_id,
                 json={"data": data, "offset": offset},
             )
 
-            # Allow the system to try to resend the chunk a couple of
-            # times before giving up.
             if chunk_result.ok:
-                offset += 1
-                retry = 0
-            elif retry < 3:
-                fd.seek(current_cursor)
-                retry += 1
-            else:
-                raise RuntimeError(
-                    "Could not send chunk %s, ran out of retries" % offset
-                )
+                return chunk_result
 
-        return result
+        raise RuntimeError("Could not send chunk %s, ran out of retries" % offset)
 
     @enable_auth
     def post_forward(self, payload, **kwargs):
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+import collections
+import io
 import json
+import os
+import tempfile
+import uuid
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
 from typing import Any, Callable, List, NoReturn, Optional, Type, Union
@@ -10,6 +16,7 @@ import six
 import wrapt
 from requests import Response  # noqa # not in requirements file
 
+from brewtils.cache import ResultCache
 from brewtils.config import get_connection_info
 from brewtils.errors import (
     BrewtilsException,
@@ -26,9 +33,12 @@ from brewtils.errors import (
     _deprecate,
 )
 from brewtils.models import BaseModel, Event, Job, PatchOperation
-from brewtils.rest.client import RestClient
+from brewtils.rest.client import RestClient, _map_file
 from brewtils.schema_parser import SchemaParser
 
+# Size of the reads used when streaming a download to disk
+DOWNLOAD_READ_SIZE = 1024 * 1024
+
 
 def get_easy_client(**kwargs):
     # type: (**Any) -> EasyClient
@@ -167,6 +177,15 @@ class EasyClient(object):
         password (str): Password for Beer-garden authentication
         access_token (str): Access token for Beer-garden authentication
         refresh_token (str): Refresh token for Beer-garden authentication
+        download_spool_size (int): Chunked files larger than this many bytes are
+            written to a temporary file on disk while they're downloaded. If 0 (the
+            default) they are always kept in memory.
+        chunk_workers (int): Number of chunks to send or fetch concurrently when
+            uploading or downloading chunked files
+        upload_reuse_ttl (int): Time (seconds) an uploaded file is reused for later
+            uploads of identical content, instead of being uploaded again. Should be
+            shorter than the time Beer-garden keeps files. If 0 (the default) files
+            are always uploaded.
     """
 
     _default_file_params = {
@@ -177,6 +196,15 @@ class EasyClient(object):
         # This points DeprecationWarnings at the right line
         kwargs.setdefault("stacklevel", 4)
 
+        self._download_spool_size = kwargs.get("download_spool_size") or 0
+        self._chunk_workers = kwargs.get("chunk_workers") or 1
+
+        # Responses for recent uploads, keyed by their content
+        upload_reuse_ttl = kwargs.get("upload_reuse_ttl") or 0
+        self._uploads = (
+            ResultCache(ttl=upload_reuse_ttl) if upload_reuse_ttl > 0 else None
+        )
+
         self.client = RestClient(*args, **kwargs)
 
     def can_connect(self, **kwargs):
@@ -914,13 +942,29 @@ class EasyClient(object):
         # type: (bytes) -> Any
         """Upload a file
 
+        If ``upload_reuse_ttl`` is set and identical bytes were uploaded recently
+        the existing file is reused.
+
         Args:
             data: The bytes to upload
 
         Returns:
             The bytes Resolvable
         """
-        return self.client.post_file(data)
+        if self._uploads is None or not isinstance(data, (bytes, bytearray)):
+            return self.client.post_file(data)
+
+        key = ("bytes", md5(data).hexdigest())
+
+        hit, response = self._uploads.get(key)
+        if hit:
+            return response
+
+        response = self.client.post_file(data)
+        if response.ok:
+            self._uploads.put(key, response)
+
+        return response
 
     def download_bytes(self, file_id):
         # type: (str) -> bytes
@@ -934,6 +978,21 @@ class EasyClient(object):
         """
         return self.client.get_file(file_id).content
 
+    def open_bytes(self, file_id):
+        # type: (str) -> io.RawIOBase
+        """Open bytes for reading without downloading them up front
+
+        Nothing is requested until the first read. The data is then streamed from
+        the server as it's read.
+
+        Args:
+            file_id: Id of bytes to open
+
+        Returns:
+            A read-only file object
+        """
+        return _StreamedBytesReader(self.client, file_id)
+
     @wrap_response(parse_method="parse_resolvable")
     def upload_file(self, path):
         # type: (Union[str, Path]) -> Any
@@ -952,21 +1011,44 @@ class EasyClient(object):
 
         return self.client.post_file(bytes_data)
 
-    def download_file(self, file_id, path):
-        # type: (str, Union[str, Path]) -> Union[str, Path]
+    def download_file(self, file_id, path, md5_sum=None):
+        # type: (str, Union[str, Path], Optional[str]) -> Union[str, Path]
         """Download a file
 
+        The file is streamed to a temporary file next to ``path``, which is renamed
+        once the download is complete. ``path`` is never left partially written.
+
         Args:
             file_id: The File id.
             path: Location for downloaded file
+            md5_sum: Expected md5 sum of the file. If given and the download doesn't
+                match it a ValidationError is raised and ``path`` isn't written.
 
         Returns:
             Path to downloaded file
         """
-        data = self.download_bytes(file_id)
+        checksum = md5()
+
+        # Created like the destination would be, so it gets the same permissions
+        temp_path = "%s.%s.part" % (path, uuid.uuid4().hex)
 
-        with open(path, "wb") as f:
-            f.write(data)
+        try:
+            with open(temp_path, "xb") as f, self.open_bytes(file_id) as source:
+                for data in _read_chunks(source, DOWNLOAD_READ_SIZE):
+                    checksum.update(data)
+                    f.write(data)
+
+            if md5_sum is not None and md5_sum != checksum.hexdigest():
+                raise ValidationError(
+                    "Requested file %s MD5 SUM %s does match actual MD5 SUM %s"
+                    % (file_id, md5_sum, checksum.hexdigest())
+                )
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        os.replace(temp_path, path)
 
         return path
 
@@ -976,8 +1058,20 @@ class EasyClient(object):
     ):
         """Upload a given file to the Beer Garden server.
 
+        Seekable files are sent without being copied first. The server needs the MD5
+        sum before the first chunk, so regular files are hashed through a memory
+        mapping and then encoded from it, which is two passes over the file but
+        neither copies it into memory. Other seekable files are read once and sent
+        without an MD5 sum, unless they are in memory. The server also needs the file
+        size before the first chunk, so anything else (pipes, iterables) is first
+        copied to a temporary file, hashing it on the way.
+
+        If ``upload_reuse_ttl`` is set and no ``file_params`` are given, a file with
+        the same name and contents uploaded recently is reused.
+
         Args:
-            file_to_upload: Can either be an open file descriptor or a path.
+            file_to_upload: Can either be an open file descriptor, a path, or an
+                iterable of bytes (for example a generator).
             desired_filename: The desired filename, if none is provided it
             will use the basename of the file_to_upload
             file_params: The metadata surrounding the file.
@@ -989,6 +1083,13 @@ class EasyClient(object):
         """
         default_file_params = {}
 
+        if desired_filename or isinstance(file_to_upload, six.string_types):
+            default_file_params["file_name"] = desired_filename or file_to_upload
+        else:
+            default_file_params["file_name"] = getattr(
+                file_to_upload, "name", "no_file_name_provided"
+            )
+
         # Establish the file descriptor
         if isinstance(file_to_upload, six.string_types):
             try:
@@ -996,16 +1097,20 @@ class EasyClient(object):
             except Exception:
                 raise ValidationError("Could not open the requested file name.")
             require_close = True
+        elif not hasattr(file_to_upload, "read") or not _seekable(file_to_upload):
+            fd, default_file_params["md5_sum"] = self._spool_upload(file_to_upload)
+            require_close = True
         else:
             fd = file_to_upload
             require_close = False
 
-        default_file_params["md5_sum"] = md5(fd.getbuffer()).hexdigest()
-
-        try:
-            default_file_params["file_name"] = desired_filename or fd.name
-        except AttributeError:
-            default_file_params["file_name"] = "no_file_name_provided"
+        # The server can't be told the checksum after the chunks are sent, so it's
+        # only included if it can be found without reading the data into memory
+        if "md5_sum" not in default_file_params:
+            if hasattr(fd, "getbuffer"):
+                default_file_params["md5_sum"] = md5(fd.getbuffer()).hexdigest()
+            else:
+                default_file_params.update(_mapped_md5(fd))
 
         # Determine the file size
         cur_cursor = fd.tell()
@@ -1014,13 +1119,36 @@ class EasyClient(object):
         if file_params is not None:
             file_params["file_size"] = default_file_params["file_size"]
 
+        # Identical content uploaded recently can reuse the existing file
+        reuse_key = None
+        if (
+            self._uploads is not None
+            and file_params is None
+            and "md5_sum" in default_file_params
+        ):
+            reuse_key = (
+                "chunks",
+                default_file_params["md5_sum"],
+                default_file_params["file_size"],
+                default_file_params["file_name"],
+            )
+
+            hit, response = self._uploads.get(reuse_key)
+            if hit:
+                if require_close:
+                    fd.close()
+                return response
+
         # Set the parameters to be sent
         file_params = file_params or dict(
             default_file_params, **self._default_file_params
         )
         try:
             response = self.client.post_chunked_file(
-                fd, file_params, current_position=cur_cursor
+                fd,
+                file_params,
+                current_position=cur_cursor,
+                workers=self._chunk_workers,
             )
             fd.seek(cur_cursor)
         finally:
@@ -1043,43 +1171,104 @@ class EasyClient(object):
                 % default_file_params["file_name"]
             )
 
+        if reuse_key is not None:
+            self._uploads.put(reuse_key, response)
+
         return response
 
-    def download_chunked_file(self, file_id):
+    def _spool_upload(self, source):
+        """Copy a non-seekable source to a temporary file, hashing it on the way
+
+        Args:
+            source: A readable file object or an iterable of bytes
+
+        Returns:
+            A tuple of the temporary file, positioned at the start, and the MD5 sum
+        """
+        chunk_size = self._default_file_params["chunk_size"]
+
+        if hasattr(source, "read"):
+            source = _read_chunks(source, chunk_size)
+
+        spool = tempfile.SpooledTemporaryFile(max_size=chunk_size)
+        checksum = md5()
+
+        for data in source:
+            # Other bytes-like chunks (bytearray, memoryview) are written as they are
+            if isinstance(data, six.string_types):
+                data = data.encode("utf-8")
+
+            checksum.update(data)
+            spool.write(data)
+
+        spool.seek(0)
+
+        return spool, checksum.hexdigest()
+
+    def download_chunked_file(self, file_id, spool_size=None):
         """Download a chunked file from the Beer Garden server.
 
         Args:
             file_id: The beer garden-assigned file id.
+            spool_size: Files larger than this many bytes are written to a temporary
+                file on disk instead of being kept in memory. Defaults to the
+                client's ``download_spool_size``.
 
         Returns:
             A file object
         """
+        if spool_size is None:
+            spool_size = self._download_spool_size
+
         (valid, meta) = self._check_chunked_file_validity(file_id)
-        file_obj = BytesIO()
+        if spool_size > 0:
+            file_obj = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        else:
+            file_obj = BytesIO()
+
+        checksum = md5()
         if valid:
-            for x in range(meta["number_of_chunks"]):
-                resp = self.client.get_chunked_file(file_id, params={"chunk": x})
-                if resp.ok:
-                    data = resp.json()["data"]
-                    file_obj.write(b64decode(data))
-                else:
-                    raise ValueError("Could not fetch chunk %d" % x)
+            try:
+                for data in self._fetch_chunks(file_id, meta["number_of_chunks"]):
+                    checksum.update(data)
+                    file_obj.write(data)
+            except Exception:
+                file_obj.close()
+                raise
         else:
+            file_obj.close()
             raise ValidationError("Requested file %s is incomplete." % file_id)
 
         file_obj.seek(0)
 
-        if (
-            "md5_sum" in meta
-            and meta["md5_sum"] != md5(file_obj.getbuffer()).hexdigest()
-        ):
+        if "md5_sum" in meta and meta["md5_sum"] != checksum.hexdigest():
+            file_obj.close()
             raise ValidationError(
                 "Requested file %s MD5 SUM %s does match actual MD5 SUM %s"
-                % (file_id, meta["md5_sum"], md5(file_obj.getbuffer()).hexdigest())
+                % (file_id, meta["md5_sum"], checksum.hexdigest())
             )
 
         return file_obj
 
+    def open_chunked_file(self, file_id):
+        """Open a chunked file for reading without downloading it up front
+
+        The file is verified when it's opened, but chunks are only fetched as they
+        are read, so at most one chunk is held in memory. If the file is read from
+        start to end its MD5 sum is checked once the last chunk has been read.
+
+        Args:
+            file_id: The beer garden-assigned file id.
+
+        Returns:
+            A read-only file object
+        """
+        (valid, meta) = self._check_chunked_file_validity(file_id)
+        if not valid:
+            raise ValidationError("Requested file %s is incomplete." % file_id)
+
+        return _ChunkedFileReader(self.client, file_id, meta)
+
     def delete_chunked_file(self, file_id):
         """Delete a given file on the Beer Garden server.
 
@@ -1153,6 +1342,45 @@ class EasyClient(object):
             job_id, SchemaParser.serialize_patch(operations, many=True)
         )
 
+    def _fetch_chunks(self, file_id, number_of_chunks):
+        """Fetch the chunks of a chunked file
+
+        Up to ``chunk_workers`` chunks are fetched concurrently, but they're always
+        yielded in order.
+
+        Args:
+            file_id: The BG-assigned file id.
+            number_of_chunks: Number of chunks in the file
+
+        Yields:
+            The decoded data of each chunk
+        """
+        if self._chunk_workers <= 1:
+            for chunk in range(number_of_chunks):
+                yield self._fetch_chunk(file_id, chunk)
+            return
+
+        with ThreadPoolExecutor(max_workers=self._chunk_workers) as pool:
+            pending = collections.deque()
+
+            for chunk in range(number_of_chunks):
+                pending.append(pool.submit(self._fetch_chunk, file_id, chunk))
+
+                if len(pending) >= self._chunk_workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def _fetch_chunk(self, file_id, chunk, retries=3):
+        """Fetch and decode one chunk of a chunked file, retrying on failure"""
+        for _ in range(retries + 1):
+            resp = self.client.get_chunked_file(file_id, params={"chunk": chunk})
+            if resp.ok:
+                return b64decode(resp.json()["data"])
+
+        raise ValueError("Could not fetch chunk %d" % chunk)
+
     def _check_chunked_file_validity(self, file_id):
         """Verify a chunked file
 
@@ -1253,3 +1481,124 @@ class EasyClient(object):
             topic_name=topic_name,
             operations=SchemaParser.serialize_patch(operations, many=True),
         )
+
+
+def _read_chunks(fd, chunk_size):
+    while True:
+        data = fd.read(chunk_size)
+        if not data:
+            return
+        yield data
+
+
+def _mapped_md5(fd):
+    """Hash a file from its current position through a memory mapping
+
+    Returns:
+        A dict with the ``md5_sum``, or an empty dict if the file can't be mapped
+    """
+    mapped = _map_file(fd)
+    if mapped is None:
+        return {}
+
+    with mapped, memoryview(mapped) as view:
+        return {"md5_sum": md5(view[fd.tell() :]).hexdigest()}
+
+
+def _seekable(fd):
+    try:
+        return fd.seekable()
+    except AttributeError:
+        # Older file-like objects may not implement seekable, assume they can
+        return True
+
+
+class _ChunkedFileReader(io.RawIOBase):
+    """Read-only file object that fetches a chunked file one chunk at a time"""
+
+    def __init__(self, client, file_id, meta):
+        super(_ChunkedFileReader, self).__init__()
+
+        self._client = client
+        self._file_id = file_id
+        self._number_of_chunks = meta["number_of_chunks"]
+        self._md5_sum = meta.get("md5_sum")
+
+        self._next_chunk = 0
+        self._buffer = b""
+        self._offset = 0
+        self._md5 = md5()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._offset == len(self._buffer):
+            if self._next_chunk == self._number_of_chunks:
+                return 0
+
+            self._buffer = self._fetch(self._next_chunk)
+            self._offset = 0
+            self._next_chunk += 1
+
+        size = min(len(b), len(self._buffer) - self._offset)
+        b[:size] = self._buffer[self._offset : self._offset + size]
+        self._offset += size
+
+        return size
+
+    def _fetch(self, chunk):
+        resp = self._client.get_chunked_file(self._file_id, params={"chunk": chunk})
+        if not resp.ok:
+            raise ValueError("Could not fetch chunk %d" % chunk)
+
+        data = b64decode(resp.json()["data"])
+
+        self._md5.update(data)
+        if (
+            chunk == self._number_of_chunks - 1
+            and self._md5_sum
+            and self._md5_sum != self._md5.hexdigest()
+        ):
+            raise ValidationError(
+                "Requested file %s MD5 SUM %s does match actual MD5 SUM %s"
+                % (self._file_id, self._md5_sum, self._md5.hexdigest())
+            )
+
+        return data
+
+
+class _StreamedBytesReader(io.RawIOBase):
+    """Read-only file object that streams bytes once it's first read"""
+
+    def __init__(self, client, file_id):
+        super(_StreamedBytesReader, self).__init__()
+
+        self._client = client
+        self._file_id = file_id
+        self._response = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._response is None:
+            self._response = self._client.get_file(self._file_id, stream=True)
+            if not self._response.ok:
+                handle_response_failure(self._response, default_exc=FetchError)
+
+            self._response.raw.decode_content = True
+
+        data = self._response.raw.read(len(b))
+        b[: len(data)] = data
+
+        if not data:
+            self._response.close()
+
+        return len(data)
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+
+        super(_StreamedBytesReader, self).close()
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
+import functools
 import json
 import logging
 import typing
 from typing import Any, Dict, Optional, Union
 
+import marshmallow  # type: ignore
+import simplejson  # type: ignore
 import six  # type: ignore
 from box import Box  # type: ignore
 
@@ -184,6 +187,20 @@ class SchemaParser(object):
         Returns:
             A Request object
         """
+        # Parsing a single request is common enough (every message a plugin
+        # receives) to be worth bypassing marshmallow when the data is simple
+        if not kwargs:
+            try:
+                if from_string:
+                    if not isinstance(request, six.string_types):
+                        raise ValueError("Unsupported data")
+
+                    return _request_parser.parse(simplejson.loads(request))
+
+                return _request_parser.parse(request)
+            except Exception:
+                pass
+
         return cls.parse(
             request, brewtils.models.Request, from_string=from_string, **kwargs
         )
@@ -1205,3 +1222,134 @@ class SchemaParser(object):
         if isinstance(obj, (dict, Box)):
             return True
         return not isinstance(obj, Iterable)
+
+
+class _FastRequestParser(object):
+    """Parse Request dictionaries without going through marshmallow
+
+    The field conversions are compiled once from ``RequestSchema``. Only values that
+    marshmallow would load unchanged are accepted; anything else (a wrong type, a
+    field this parser doesn't understand, ...) raises ``ValueError`` so the caller
+    can fall back to the schema. That keeps errors and edge cases identical to
+    ``SchemaParser.parse``.
+
+    Args:
+        schema_class: The schema to compile
+        model_class: The model to construct
+    """
+
+    def __init__(self, schema_class, model_class):
+        self._model_class = model_class
+        self._converters = {}
+
+        for name, field in schema_class._declared_fields.items():
+            self._converters[name] = self._compile(field)
+
+    def parse(self, data, exclude=()):
+        """Parse a single Request dictionary
+
+        Raises:
+            ValueError: The data needs to be parsed by the schema instead
+        """
+        if type(data) is not dict:
+            raise ValueError("Unsupported data")
+
+        kwargs = {}
+        for key, value in data.items():
+            if key in exclude:
+                continue
+
+            converter = self._converters.get(key, _ignore)
+            if converter is _ignore:
+                continue
+
+            kwargs[key] = converter(value)
+
+        return self._model_class(**kwargs)
+
+    def _compile(self, field):
+        if (
+            field.required
+            or field.validators
+            or field.load_from
+            or field.attribute
+            or field.allow_none is not True
+        ):
+            return _unsupported
+
+        # Exact types, so a field subclass with different loading isn't mistaken
+        # for one of these
+        if type(field) is brewtils.schemas.DateTime:
+            return _convert_epoch
+        if type(field) is marshmallow.fields.String:
+            return _convert_string
+        if type(field) is marshmallow.fields.Boolean:
+            return _convert_bool
+        if type(field) is marshmallow.fields.Dict:
+            return _convert_dict
+        if type(field) is marshmallow.fields.Nested and field.nested == "self":
+            if field.only:
+                return _unsupported
+
+            return functools.partial(
+                self._convert_nested, exclude=tuple(field.exclude), many=field.many
+            )
+
+        return _unsupported
+
+    def _convert_nested(self, value, exclude, many):
+        if value is None:
+            return None
+
+        if many:
+            if type(value) is not list:
+                raise ValueError("Unsupported list")
+
+            return [self.parse(item, exclude=exclude) for item in value]
+
+        return self.parse(value, exclude=exclude)
+
+
+def _ignore(value):
+    return value
+
+
+def _unsupported(value):
+    raise ValueError("Unsupported field")
+
+
+def _convert_string(value):
+    if value is None or type(value) is six.text_type:
+        return value
+
+    raise ValueError("Unsupported string")
+
+
+def _convert_bool(value):
+    if value is None or type(value) is bool:
+        return value
+
+    raise ValueError("Unsupported boolean")
+
+
+def _convert_dict(value):
+    if value is None or type(value) is dict:
+        return value
+
+    raise ValueError("Unsupported dictionary")
+
+
+def _convert_epoch(value):
+    if value is None:
+        return None
+
+    # Marshmallow rejects 0, and bool is an int subclass
+    if type(value) not in six.integer_types or not value:
+        raise ValueError("Unsupported epoch")
+
+    return brewtils.schemas.DateTime.from_epoch(value)
+
+
+_request_parser = _FastRequestParser(
+    brewtils.schemas.RequestSchema, brewtils.models.Request
+)
@@ -215,16 +215,186 @@ _PLUGIN_SPEC = {
         ),
         "default": -1,
     },
+    "max_prefetch": {
+        "type": "int",
+        "description": "Maximum number of requests to receive from RabbitMQ before "
+        "they start processing",
+        "long_description": "Requests received beyond max_concurrent wait locally "
+        "and are started in message priority order. Values less than max_concurrent "
+        "(including the default of 0) mean no requests wait locally.",
+        "default": 0,
+    },
+    "adaptive_prefetch": {
+        "type": "bool",
+        "description": "Adjust the RabbitMQ prefetch based on how requests are being "
+        "processed",
+        "long_description": "The prefetch is lowered when more than about one "
+        "received request is waiting for a worker and raised when none are waiting "
+        "and the prefetch was reached, so it follows the number of busy workers. "
+        "It stays between min_prefetch and max_prefetch. If max_prefetch is not "
+        "above max_concurrent, twice max_concurrent is used instead.",
+        "default": False,
+    },
+    "min_prefetch": {
+        "type": "int",
+        "description": "Lowest RabbitMQ prefetch used with adaptive_prefetch",
+        "default": 1,
+    },
+    "parse_workers": {
+        "type": "int",
+        "description": "Number of threads used to parse and validate received "
+        "requests",
+        "long_description": "If 0 (the default) requests are parsed by the thread "
+        "that talks to RabbitMQ, so large requests can delay heartbeats and acks.",
+        "default": 0,
+    },
+    "max_concurrent_async": {
+        "type": "int",
+        "description": "Maximum number of coroutine (async def) requests to process "
+        "concurrently",
+        "long_description": "Coroutine commands run on a dedicated event loop instead "
+        "of the thread pool, so this can be larger than max_concurrent. It only "
+        "applies if the plugin client defines at least one coroutine command, and is "
+        "then added to the RabbitMQ prefetch. That extra prefetch is shared by every "
+        "command, so requests for other commands can use it to wait locally for a "
+        "worker instead of being left for other plugin instances.",
+        "default": 50,
+    },
+    "max_process_workers": {
+        "type": "int",
+        "description": "Maximum number of worker processes for process commands",
+        "long_description": "Only used by commands declared with "
+        '@command(executor="process"). If 0 (the default) the number of processors '
+        "on the machine is used. Each process request also holds one of the "
+        "max_concurrent worker threads while it runs, so no more than max_concurrent "
+        "of them run at once.",
+        "default": 0,
+    },
+    "process_start_method": {
+        "type": "str",
+        "description": "Multiprocessing start method used for process commands",
+        "long_description": "Forking a process that's running threads can deadlock "
+        "the new worker, so fork should only be used if the plugin is known to be "
+        "safe with it. With spawn and forkserver the plugin client must be picklable "
+        "and the plugin's main module must be importable without starting the plugin.",
+        "choices": ["spawn", "forkserver", "fork"],
+        "default": "spawn",
+    },
     "worker_shutdown_timeout": {
         "type": "int",
         "description": "Time to wait during shutdown to finish processing requests",
         "default": 5,
     },
+    "drain_timeout": {
+        "type": "int",
+        "description": "Time (seconds) to wait during shutdown for running requests",
+        "long_description": "If 0 or more, shutdown requeues requests that haven't "
+        "started so other instances can process them, and waits this long for "
+        "running requests before abandoning them. Abandoned requests are requeued and "
+        "their results discarded, but the process does not exit until they finish "
+        "unless drain_exit is set. "
+        "If negative shutdown waits for every received request to finish.",
+        "default": -1,
+    },
+    "drain_exit": {
+        "type": "bool",
+        "description": "Exit the process once shut down if the drain abandoned "
+        "requests",
+        "long_description": "Abandoned requests keep running in worker threads, and "
+        "Python waits for those before the process can exit, so a stuck command "
+        "keeps the plugin from exiting. If set, the process exits (with os._exit) "
+        "as soon as the plugin has shut down instead.",
+        "default": False,
+    },
     "max_attempts": {
         "type": "int",
         "description": "Number of times to attempt a request update",
         "default": -1,
     },
+    "max_concurrent_updates": {
+        "type": "int",
+        "description": "Maximum number of request updates to send concurrently",
+        "long_description": "If greater than 0 request updates are queued and sent "
+        "by this many background threads, and stale updates for a request are "
+        "dropped when a newer one is queued. If 0 each update is sent by the thread "
+        "processing the request.",
+        "default": 0,
+    },
+    "in_progress_delay": {
+        "type": "int",
+        "description": "Time (milliseconds) a command must run before the IN_PROGRESS "
+        "request update is sent",
+        "long_description": "Commands that finish within this time only send their "
+        "final request update. If 0 the IN_PROGRESS update is always sent before "
+        "the command is invoked.",
+        "default": 0,
+    },
+    "max_output_size": {
+        "type": "int",
+        "description": "Largest request output (bytes) to send inline",
+        "long_description": "Larger outputs are uploaded using the chunked file API "
+        "and the request output is set to a reference to the uploaded file. If 0 "
+        "outputs are always sent inline.",
+        "default": 0,
+    },
+    "download_spool_size": {
+        "type": "int",
+        "description": "Largest chunked file parameter (bytes) to download into "
+        "memory",
+        "long_description": "Larger files are written to a temporary file on disk as "
+        "they're downloaded. If 0 files are always downloaded into memory.",
+        "default": 0,
+    },
+    "chunk_workers": {
+        "type": "int",
+        "description": "Number of chunks to send or fetch concurrently when "
+        "transferring chunked files",
+        "default": 1,
+    },
+    "completed_request_cache_size": {
+        "type": "int",
+        "description": "Number of completed requests to remember",
+        "long_description": "If a message is redelivered for a remembered request "
+        "only its final update is sent again, instead of invoking the command. If 0 "
+        "completed requests are not remembered.",
+        "default": 0,
+    },
+    "completed_request_cache_path": {
+        "type": "str",
+        "description": "File used to remember completed requests across restarts",
+        "long_description": "If not set completed requests are only remembered in "
+        "memory. Relative paths are relative to the working directory.",
+        "required": False,
+    },
+    "file_cache_size": {
+        "type": "int",
+        "description": "Maximum size (bytes) of the cache of downloaded file "
+        "parameters",
+        "long_description": "Bytes and base64 parameters are kept in an on-disk "
+        "cache and are only downloaded if they aren't already cached. If 0 they are "
+        "not cached.",
+        "default": 0,
+    },
+    "file_cache_path": {
+        "type": "str",
+        "description": "Directory used to cache downloaded file parameters",
+        "long_description": "Plugins using the same directory share the cache. "
+        "Relative paths are relative to the working directory.",
+        "default": "file_cache",
+    },
+    "metrics_port": {
+        "type": "int",
+        "description": "Port to serve request processing metrics on",
+        "long_description": "If set, metrics are recorded and served in the "
+        "Prometheus text format from /metrics on this port. If not set metrics are "
+        "not recorded.",
+        "required": False,
+    },
+    "metrics_host": {
+        "type": "str",
+        "description": "Address to serve request processing metrics on",
+        "default": "127.0.0.1",
+    },
     "max_timeout": {
         "type": "int",
         "description": "Maximum amount of time to wait between request update retries",
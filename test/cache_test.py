@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import tempfile
+
+import pytest
+
+import brewtils.cache
+from brewtils.cache import CompletedRequestCache, FileCache, ResultCache
+
+
+class TestMakeKey(object):
+    def test_canonical(self):
+        assert ResultCache.make_key({"a": 1, "b": [1, 2]}) == ResultCache.make_key(
+            {"b": [1, 2], "a": 1}
+        )
+
+    def test_different(self):
+        assert ResultCache.make_key({"a": 1}) != ResultCache.make_key({"a": 2})
+
+    def test_not_serializable(self):
+        assert ResultCache.make_key({"file": io.BytesIO()}) is None
+
+
+class TestResultCache(object):
+    @pytest.fixture
+    def now(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(brewtils.cache.time, "monotonic", lambda: now[0])
+        return now
+
+    def test_hit_miss(self):
+        cache = ResultCache()
+
+        assert cache.get("key") == (False, None)
+        cache.put("key", "output")
+        assert cache.get("key") == (True, "output")
+
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_ttl(self, now):
+        cache = ResultCache(ttl=10)
+        cache.put("key", "output")
+
+        now[0] += 5
+        assert cache.get("key") == (True, "output")
+
+        now[0] += 10
+        assert cache.get("key") == (False, None)
+        assert len(cache) == 0
+
+    def test_lru(self):
+        cache = ResultCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # Using "a" makes "b" the least recently used
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("a") == (True, 1)
+        assert cache.get("b") == (False, None)
+        assert cache.get("c") == (True, 3)
+
+    def test_clear(self):
+        cache = ResultCache()
+        cache.put("key", "output")
+        cache.clear()
+
+        assert len(cache) == 0
+
+
+class TestCompletedRequestCache(object):
+    @pytest.fixture(params=["memory", "disk"])
+    def cache(self, request, tmpdir):
+        path = str(tmpdir.join("completed.db")) if request.param == "disk" else None
+        cache = CompletedRequestCache(2, path=path)
+        yield cache
+        cache.close()
+
+    def test_get_put(self, cache):
+        assert cache.get("id") is None
+
+        cache.put("id", "SUCCESS", "output", None)
+        assert cache.get("id") == ("SUCCESS", "output", None)
+
+    def test_lru(self, cache):
+        cache.put("a", "SUCCESS", "a", None)
+        cache.put("b", "SUCCESS", "b", None)
+
+        # Using "a" makes "b" the least recently used
+        cache.get("a")
+        cache.put("c", "ERROR", "c", "ValueError")
+
+        assert len(cache) == 2
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") == ("ERROR", "c", "ValueError")
+
+    def test_persistent(self, tmpdir):
+        path = str(tmpdir.join("completed.db"))
+
+        cache = CompletedRequestCache(2, path=path)
+        cache.put("id", "SUCCESS", "output", None)
+        cache.close()
+
+        cache = CompletedRequestCache(2, path=path)
+        assert cache.get("id") == ("SUCCESS", "output", None)
+        cache.close()
+
+
+class TestFileCache(object):
+    @pytest.fixture
+    def cache(self, tmpdir):
+        # Room for two 10 byte files, along with their checksums
+        return FileCache(str(tmpdir.join("files")), 84)
+
+    def test_get_put(self, cache):
+        assert cache.get("id") is None
+
+        file_obj = io.BytesIO(b"0123456789")
+        file_obj.seek(4)
+        cache.put("id", file_obj)
+
+        assert file_obj.tell() == 0
+        assert cache.get("id").read() == b"0123456789"
+
+    def test_spool(self, tmpdir):
+        cache = FileCache(str(tmpdir), 1024, spool_size=4)
+        cache.put("id", io.BytesIO(b"0123456789"))
+
+        file_obj = cache.get("id")
+        assert isinstance(file_obj, tempfile.SpooledTemporaryFile)
+        assert file_obj.read() == b"0123456789"
+
+    def test_shared(self, cache):
+        cache.put("id", io.BytesIO(b"0123456789"))
+
+        assert FileCache(cache.path, 84).get("id").read() == b"0123456789"
+
+    def test_lru(self, cache):
+        cache.put("a", io.BytesIO(b"aaaaaaaaaa"))
+        cache.put("b", io.BytesIO(b"bbbbbbbbbb"))
+        os.utime(cache._entry("a"), (1, 1))
+        os.utime(cache._entry("b"), (2, 2))
+
+        # Using "a" makes "b" the least recently used
+        cache.get("a")
+        cache.put("c", io.BytesIO(b"cccccccccc"))
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c").read() == b"cccccccccc"
+
+    def test_too_large(self, cache):
+        cache.put("id", io.BytesIO(b"0" * 100))
+
+        assert cache.get("id") is None
+        assert os.listdir(cache.path) == []
+
+    def test_corrupt(self, cache):
+        cache.put("id", io.BytesIO(b"0123456789"))
+
+        with open(cache._entry("id"), "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"X")
+
+        assert cache.get("id") is None
+        assert os.listdir(cache.path) == []
+
+    def test_write_error(self, cache, monkeypatch):
+        def replace(src, dst):
+            raise OSError("full")
+
+        monkeypatch.setattr(brewtils.cache.os, "replace", replace)
+        cache.put("id", io.BytesIO(b"0123456789"))
+
+        assert cache.get("id") is None
+        assert os.listdir(cache.path) == []
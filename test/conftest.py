@@ -33,3 +33,18 @@ def global_config():
     """Make sure that the global CONFIG is reset after every test"""
     yield
     brewtils.plugin.CONFIG = Box(default_box=True)
+
+
+@pytest.fixture
+def metrics_enabled(monkeypatch):
+    """Record metrics for a single test, starting and ending with no values"""
+    import brewtils.metrics
+
+    monkeypatch.setattr(brewtils.metrics, "enabled", True)
+    for metric in brewtils.metrics.METRICS:
+        metric.clear()
+
+    yield brewtils.metrics
+
+    for metric in brewtils.metrics.METRICS:
+        metric.clear()
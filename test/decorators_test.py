@@ -686,6 +686,81 @@ class TestCommand(object):
         assert cmd2._command.output_type == "STRING"
         assert cmd3._command.output_type == "STRING"
 
+    @pytest.mark.parametrize(
+        "executor,expected",
+        [(None, "thread"), ("thread", "thread"), ("process", "process")],
+    )
+    def test_executor(self, executor, expected):
+        @command(executor=executor)
+        def cmd(foo):
+            return foo
+
+        assert cmd._executor == expected
+
+    def test_executor_invalid(self):
+        with pytest.raises(PluginParamError):
+
+            @command(executor="fiber")
+            def cmd(foo):
+                return foo
+
+    @pytest.mark.parametrize("max_concurrent", [None, 1, 5])
+    def test_max_concurrent(self, max_concurrent):
+        @command(max_concurrent=max_concurrent)
+        def cmd(foo):
+            return foo
+
+        assert cmd._max_concurrent == max_concurrent
+
+    @pytest.mark.parametrize("max_concurrent", [0, -1, "1"])
+    def test_max_concurrent_invalid(self, max_concurrent):
+        with pytest.raises(PluginParamError):
+
+            @command(max_concurrent=max_concurrent)
+            def cmd(foo):
+                return foo
+
+    @pytest.mark.parametrize(
+        "cache,expected",
+        [
+            (None, None),
+            (False, None),
+            (True, {"ttl": None, "max_size": 128}),
+            ({"ttl": 30}, {"ttl": 30, "max_size": 128}),
+            ({"ttl": 0.5, "max_size": 5}, {"ttl": 0.5, "max_size": 5}),
+        ],
+    )
+    def test_cache(self, cache, expected):
+        @command(cache=cache)
+        def cmd(foo):
+            return foo
+
+        assert cmd._cache == expected
+
+    @pytest.mark.parametrize(
+        "cache", ["yes", {"size": 5}, {"ttl": 0}, {"ttl": True}, {"max_size": 0}]
+    )
+    def test_cache_invalid(self, cache):
+        with pytest.raises(PluginParamError):
+
+            @command(cache=cache)
+            def cmd(foo):
+                return foo
+
+    def test_cache_coroutine(self):
+        with pytest.raises(PluginParamError):
+
+            @command(cache=True)
+            async def cmd(foo):
+                return foo
+
+    def test_executor_process_coroutine(self):
+        with pytest.raises(PluginParamError):
+
+            @command(executor="process")
+            async def cmd(foo):
+                return foo
+
 
 class TestParameter(object):
     """Test parameter decorator
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import pytest
+import requests
+
+from brewtils import metrics
+from brewtils.metrics import Counter, Gauge, Histogram
+
+
+class TestCounter(object):
+    def test_disabled(self):
+        counter = Counter("test_total", "Test counter")
+        counter.inc()
+
+        assert counter.render() == [
+            "# HELP test_total Test counter",
+            "# TYPE test_total counter",
+        ]
+
+    def test_inc(self, metrics_enabled):
+        counter = Counter("test_total", "Test counter", labels=["queue"])
+        counter.inc("a")
+        counter.inc("a", amount=2)
+        counter.inc('b"')
+
+        assert counter.render()[2:] == [
+            'test_total{queue="a"} 3',
+            'test_total{queue="b\\""} 1',
+        ]
+
+
+class TestGauge(object):
+    def test_inc_dec(self, metrics_enabled):
+        gauge = Gauge("test", "Test gauge")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        assert gauge.render()[1:] == ["# TYPE test gauge", "test 1"]
+
+
+class TestHistogram(object):
+    def test_observe(self, metrics_enabled):
+        histogram = Histogram(
+            "test_seconds",
+            "Test histogram",
+            labels=["command"],
+            buckets=(0.1, 1.0, float("inf")),
+        )
+        histogram.observe(0.05, "cmd")
+        histogram.observe(0.5, "cmd")
+        histogram.observe(5, "cmd")
+
+        assert histogram.render()[2:] == [
+            'test_seconds_bucket{command="cmd",le="0.1"} 1',
+            'test_seconds_bucket{command="cmd",le="1.0"} 2',
+            'test_seconds_bucket{command="cmd",le="+Inf"} 3',
+            'test_seconds_count{command="cmd"} 3',
+            'test_seconds_sum{command="cmd"} 5.55',
+        ]
+
+
+class TestServer(object):
+    @pytest.fixture
+    def server(self):
+        host, port = metrics.start_server(0)
+        yield "http://%s:%s" % (host, port)
+        metrics.stop_server()
+
+        for metric in metrics.METRICS:
+            metric.clear()
+
+    def test_metrics(self, server):
+        assert metrics.enabled is True
+
+        metrics.UPDATE_RETRIES.inc()
+
+        response = requests.get(server + "/metrics")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert "brewtils_request_update_retries_total 1" in response.text
+
+    def test_not_found(self, server):
+        assert requests.get(server + "/other").status_code == 404
+
+    def test_stop(self, server):
+        metrics.stop_server()
+        assert metrics.enabled is False
@@ -21,6 +21,7 @@ from brewtils.errors import (
 from brewtils.log import default_config
 from brewtils.models import Command, Instance, System
 from brewtils.plugin import Plugin, PluginBase, RemotePlugin
+from brewtils.request_handling import HTTPRequestUpdater, QueuedHTTPRequestUpdater
 
 
 @pytest.fixture(autouse=True)
@@ -273,6 +274,23 @@ class TestRun(object):
         assert startup_mock.called is True
         assert shutdown_mock.called is True
 
+    @pytest.mark.parametrize(
+        "drain_exit,abandoned,exits",
+        [(False, 1, False), (True, 0, False), (True, 1, True)],
+    )
+    def test_drain_exit(self, monkeypatch, plugin, drain_exit, abandoned, exits):
+        exit_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.os, "_exit", exit_mock)
+        monkeypatch.setattr(brewtils.plugin.logging, "shutdown", Mock())
+        plugin._shutdown_event = Mock()
+        plugin._startup = Mock()
+        plugin._shutdown = Mock()
+        plugin._drain_stats = {"abandoned": abandoned}
+        plugin._config.drain_exit = drain_exit
+
+        plugin.run()
+        assert exit_mock.called is exits
+
     def test_missing_client(self, bg_system):
         """Create a Plugin with no client, set it once, but never change"""
         # Don't use the plugin fixture as it already has a client
@@ -400,6 +418,21 @@ class TestStartup(object):
         )
         assert work_dir_base in plugin._config.working_directory
 
+    def test_metrics(
+        self, monkeypatch, plugin, admin_processor, request_processor, bg_system
+    ):
+        start_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.metrics, "start_server", start_mock)
+        plugin._config.metrics_port = 9090
+        plugin._ez_client.update_system = Mock(return_value=plugin._system)
+        plugin._initialize_processors = Mock(
+            return_value=(admin_processor, request_processor)
+        )
+        plugin._ez_client.find_unique_system = Mock(return_value=bg_system)
+
+        plugin._startup()
+        start_mock.assert_called_once_with(9090, host="127.0.0.1")
+
     def test_connect_fail(self, plugin, admin_processor, request_processor):
         plugin._ez_client.can_connect.return_value = False
 
@@ -413,12 +446,23 @@ class TestShutdown(object):
         plugin._admin_processor = Mock()
 
         plugin._shutdown()
+        assert plugin._drain_stats == plugin._request_processor.shutdown.return_value
         assert plugin._request_processor.shutdown.called is True
         assert plugin._admin_processor.shutdown.called is True
         ez_client.update_instance.assert_called_once_with(
             bg_instance.id, new_status="STOPPED"
         )
 
+    def test_metrics(self, monkeypatch, plugin):
+        stop_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.metrics, "stop_server", stop_mock)
+        plugin._request_processor = Mock()
+        plugin._admin_processor = Mock()
+        plugin._config.metrics_port = 9090
+
+        plugin._shutdown()
+        assert stop_mock.called is True
+
     def test_update_error(self, caplog, plugin, ez_client, bg_instance):
         plugin.request_consumer = Mock()
         plugin.admin_consumer = Mock()
@@ -624,6 +668,127 @@ class TestInitializeProcessors(object):
         assert admin.consumer._queue_name == admin_queue
         assert request.consumer._queue_name == request_queue
 
+    @pytest.mark.parametrize(
+        "max_concurrent_updates,updater_class",
+        [(0, HTTPRequestUpdater), (2, QueuedHTTPRequestUpdater)],
+    )
+    def test_updater(self, plugin, max_concurrent_updates, updater_class):
+        plugin._config.max_concurrent_updates = max_concurrent_updates
+
+        admin, request = plugin._initialize_processors()
+        assert type(request._updater) is updater_class
+        assert admin._updater is request._updater
+
+    @pytest.mark.parametrize("is_async,prefetch", [(False, 3), (True, 13)])
+    def test_async_prefetch(self, monkeypatch, plugin, is_async, prefetch):
+        create_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.RequestConsumer, "create", create_mock)
+        monkeypatch.setattr(plugin, "_has_async_commands", Mock(return_value=is_async))
+
+        plugin._config.max_concurrent = 3
+        plugin._config.max_concurrent_async = 10
+
+        plugin._initialize_processors()
+        assert create_mock.call_args_list[1][1]["max_concurrent"] == prefetch
+
+    @pytest.mark.parametrize("max_prefetch,prefetch", [(0, 3), (2, 3), (10, 10)])
+    def test_max_prefetch(self, monkeypatch, plugin, max_prefetch, prefetch):
+        create_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.RequestConsumer, "create", create_mock)
+        monkeypatch.setattr(plugin, "_has_async_commands", Mock(return_value=False))
+
+        plugin._config.max_concurrent = 3
+        plugin._config.max_prefetch = max_prefetch
+
+        plugin._initialize_processors()
+        assert create_mock.call_args_list[1][1]["max_concurrent"] == prefetch
+
+    @pytest.mark.parametrize("max_prefetch,prefetch", [(0, 6), (3, 6), (10, 10)])
+    def test_adaptive_prefetch(self, monkeypatch, plugin, max_prefetch, prefetch):
+        create_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.RequestConsumer, "create", create_mock)
+        monkeypatch.setattr(plugin, "_has_async_commands", Mock(return_value=False))
+
+        plugin._config.max_concurrent = 3
+        plugin._config.max_prefetch = max_prefetch
+        plugin._config.adaptive_prefetch = True
+
+        plugin._initialize_processors()
+        assert create_mock.call_args_list[1][1]["max_concurrent"] == prefetch
+
+    @pytest.mark.parametrize(
+        "is_limited,prefetch,max_held", [(False, 3, None), (True, 6, 3)]
+    )
+    def test_limited_prefetch(
+        self, monkeypatch, plugin, is_limited, prefetch, max_held
+    ):
+        create_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.RequestConsumer, "create", create_mock)
+        monkeypatch.setattr(plugin, "_has_async_commands", Mock(return_value=False))
+        monkeypatch.setattr(
+            plugin, "_has_limited_commands", Mock(return_value=is_limited)
+        )
+
+        plugin._config.max_concurrent = 3
+
+        _, request = plugin._initialize_processors()
+        assert create_mock.call_args_list[1][1]["max_concurrent"] == prefetch
+        assert request._max_held == max_held
+
+    def test_process_options(self, plugin):
+        plugin._config.max_process_workers = 2
+        plugin._config.process_start_method = "forkserver"
+
+        _, request = plugin._initialize_processors()
+        assert request._max_process_workers == 2
+        assert request._process_start_method == "forkserver"
+
+    def test_parse_workers(self, monkeypatch, plugin):
+        create_mock = Mock()
+        monkeypatch.setattr(brewtils.plugin.RequestConsumer, "create", create_mock)
+
+        plugin._config.parse_workers = 2
+
+        plugin._initialize_processors()
+        assert "parse_workers" not in create_mock.call_args_list[0][1]
+        assert create_mock.call_args_list[1][1]["parse_workers"] == 2
+
+
+class TestInitializeCompletedRequests(object):
+    def test_disabled(self, plugin):
+        assert plugin._initialize_completed_requests() is None
+
+    def test_memory(self, plugin):
+        plugin._config.completed_request_cache_size = 10
+
+        completed = plugin._initialize_completed_requests()
+        assert completed.max_size == 10
+        assert completed.path is None
+
+    def test_disk(self, plugin, tmpdir):
+        plugin._config.completed_request_cache_size = 10
+        plugin._config.completed_request_cache_path = "completed.db"
+        plugin._config.working_directory = str(tmpdir)
+
+        completed = plugin._initialize_completed_requests()
+        assert completed.path == str(tmpdir.join("completed.db"))
+        completed.close()
+
+
+class TestInitializeFileCache(object):
+    def test_disabled(self, plugin):
+        assert plugin._initialize_file_cache() is None
+
+    def test_enabled(self, plugin, tmpdir):
+        plugin._config.file_cache_size = 1024
+        plugin._config.download_spool_size = 64
+        plugin._config.working_directory = str(tmpdir)
+
+        file_cache = plugin._initialize_file_cache()
+        assert file_cache.path == str(tmpdir.join("file_cache"))
+        assert file_cache.max_size == 1024
+        assert file_cache.spool_size == 64
+
 
 class TestAdminMethods(object):
     def test_start(self, plugin, ez_client, bg_instance):
@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import json
 import logging
+import os
 import sys
 import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
 
 import pytest
 from mock import ANY, MagicMock, Mock
 from requests import ConnectionError as RequestsConnectionError
 
-from brewtils.decorators import parameter
+from brewtils.cache import CompletedRequestCache
+from brewtils.decorators import command, parameter
 import brewtils.plugin
 from brewtils.errors import (
     DiscardMessageException,
@@ -19,14 +24,17 @@ from brewtils.errors import (
     ErrorLogLevelWarning,
     RepublishRequestException,
     RequestProcessingError,
+    RequeueMessageException,
     RestClientError,
+    RestError,
     SuppressStacktrace,
     TooLargeError,
 )
-from brewtils.models import Command, Request, System, Parameter
+from brewtils.models import Command, Parameter, Request, Resolvable, System
 from brewtils.request_handling import (
     HTTPRequestUpdater,
     LocalRequestProcessor,
+    QueuedHTTPRequestUpdater,
     RequestProcessor,
 )
 from brewtils.schema_parser import SchemaParser
@@ -37,6 +45,21 @@ class CustomException(SuppressStacktrace):
     pass
 
 
+class ProcessClient(object):
+    @command(executor="process")
+    def pid(self, offset=0):
+        return os.getpid() + offset
+
+    @command(executor="process")
+    def crash(self):
+        os._exit(1)
+
+    @command(executor="process")
+    def context(self, big=None):
+        request = brewtils.plugin.request_context.current_request
+        return {"id": request.id, "parameters": request.parameters}
+
+
 class TestRequestProcessor(object):
     @pytest.fixture
     def target_mock(self):
@@ -119,6 +142,184 @@ class TestRequestProcessor(object):
             processor.on_message_received("{}", {})
             assert validation_mock.called is True
 
+        def test_async_command(self, processor, pool_mock, updater_mock):
+            class AsyncClient(object):
+                async def command(self):
+                    return "done"
+
+            processor._target = AsyncClient()
+
+            future = processor.on_message_received(
+                json.dumps({"command": "command", "status": "CREATED"}), {}
+            )
+            future.result(timeout=5)
+            processor._stop_event_loop()
+
+            assert pool_mock.submit.called is False
+            request = updater_mock.update_request.call_args[0][0]
+            assert request.status == "SUCCESS"
+            assert request.output == "done"
+
+        def test_limited_command(self, processor, pool_mock):
+            class LimitedClient(object):
+                @command(max_concurrent=1)
+                def command(self):
+                    return "done"
+
+            processor._target = LimitedClient()
+            processor._max_workers = 2
+            message = json.dumps({"command": "command", "status": "CREATED"})
+
+            running = processor.on_message_received(message, {})
+            held = processor.on_message_received(message, {})
+
+            assert running == pool_mock.submit.return_value
+            assert pool_mock.submit.call_count == 1
+            assert held.done() is False
+
+            # Finishing the running request should submit the held one
+            processor._release_limiter(processor._command_limiters["command"])
+
+            assert pool_mock.submit.call_count == 2
+            assert held.result() == pool_mock.submit.return_value
+
+        def test_limited_command_max_held(self, processor, pool_mock, consumer_mock):
+            class LimitedClient(object):
+                @command(max_concurrent=1)
+                def limited(self):
+                    return "done"
+
+                def other(self):
+                    return "done"
+
+            processor._target = LimitedClient()
+            processor._max_workers = 4
+            processor._max_held = 2
+            limited = json.dumps({"command": "limited", "status": "CREATED"})
+
+            processor.on_message_received(limited, {})
+            first = processor.on_message_received(limited, {})
+            assert consumer_mock.pause_consuming.called is False
+
+            # Reaching max_held pauses the consumer, but doesn't requeue anything
+            second = processor.on_message_received(limited, {})
+            late = processor.on_message_received(limited, {})
+            assert consumer_mock.pause_consuming.call_count == 1
+            assert not any(held.done() for held in (first, second, late))
+
+            # Other commands already received are still processed
+            other = processor.on_message_received(
+                json.dumps({"command": "other", "status": "CREATED"}), {}
+            )
+            assert other == pool_mock.submit.return_value
+            assert pool_mock.submit.call_count == 2
+
+            # Deliveries resume once half of max_held is left
+            limiter = processor._command_limiters["limited"]
+            processor._release_limiter(limiter)
+            assert first.result() == pool_mock.submit.return_value
+            assert consumer_mock.resume_consuming.called is False
+
+            processor._release_limiter(limiter)
+            assert second.result() == pool_mock.submit.return_value
+            assert consumer_mock.resume_consuming.call_count == 1
+
+        def test_limited_command_released(self, processor):
+            class LimitedClient(object):
+                @command(max_concurrent=1)
+                def command(self):
+                    return "done"
+
+            processor._target = LimitedClient()
+            message = json.dumps({"command": "command", "status": "CREATED"})
+
+            processor.on_message_received(message, {}).result(timeout=5)
+            processor.on_message_received(message, {}).result(timeout=5)
+
+            assert processor._command_limiters["command"].running == 0
+            assert len(processor._command_limiters["command"].held) == 0
+
+    class TestRedelivered(object):
+        @pytest.fixture
+        def completed(self, processor):
+            completed = CompletedRequestCache(10)
+            processor._completed_requests = completed
+            return completed
+
+        def test_known(self, processor, pool_mock, completed):
+            completed.put("1", "SUCCESS", "output", None)
+
+            processor.on_message_received(
+                json.dumps({"id": "1", "status": "IN_PROGRESS"}), {}, redelivered=True
+            )
+
+            assert pool_mock.submit.call_args[0][0] == processor._updater.update_request
+            request = pool_mock.submit.call_args[0][1]
+            assert request.status == "SUCCESS"
+            assert request.output == "output"
+
+        @pytest.mark.parametrize("redelivered", [True, False])
+        def test_process(self, processor, pool_mock, completed, redelivered):
+            # Only redelivered messages are checked against completed requests
+            if not redelivered:
+                completed.put("1", "SUCCESS", "output", None)
+
+            processor.on_message_received(
+                json.dumps({"id": "1", "status": "CREATED"}),
+                {},
+                redelivered=redelivered,
+            )
+            assert pool_mock.submit.call_args[0][0] == processor.process_message
+
+        def test_record(self, processor, completed, invoke_mock, format_mock):
+            processor.process_message(Mock(), Request(id="1", command="cmd"), {})
+
+            assert completed.get("1") == ("SUCCESS", format_mock.return_value, None)
+
+    class TestPriority(object):
+        def test_waits_for_worker(self, processor, pool_mock):
+            processor.on_message_received(json.dumps({"status": "CREATED"}), {})
+            waiting = processor.on_message_received(
+                json.dumps({"status": "CREATED"}), {}
+            )
+
+            assert pool_mock.submit.call_count == 1
+            assert waiting.done() is False
+            assert processor.backlog() == 1
+            assert processor.consumer.backlog_callback == processor.backlog
+
+        def test_priority_order(self, processor):
+            started = []
+            release = threading.Event()
+
+            def block(*_):
+                release.wait(5)
+
+            processor.process_message = Mock(side_effect=block)
+            processor.on_message_received(json.dumps({"id": "first"}), {})
+
+            processor.process_message = Mock(
+                side_effect=lambda _, request, __: started.append(request.id)
+            )
+            futures = [
+                processor.on_message_received(
+                    json.dumps({"id": request_id}), {}, priority=priority
+                )
+                for request_id, priority in [
+                    ("low", None),
+                    ("high", 2),
+                    ("medium", 1),
+                    ("high_2", 2),
+                ]
+            ]
+
+            release.set()
+            for future in futures:
+                future.result(timeout=5).result(timeout=5)
+
+            assert started == ["high", "high_2", "medium", "low"]
+            assert processor._running == 0
+
     class TestProcessMessage(object):
         def test_process(
             self, processor, target_mock, updater_mock, invoke_mock, format_mock
@@ -132,6 +333,38 @@ class TestRequestProcessor(object):
             assert request_mock.status == "SUCCESS"
             assert request_mock.output == format_mock.return_value
 
+        def test_metrics(self, processor, invoke_mock, format_mock, metrics_enabled):
+            processor._target = Mock()
+            future = processor.on_message_received(
+                json.dumps({"command": "cmd", "status": "CREATED"}), {}
+            )
+            future.result(timeout=5)
+
+            assert len(processor._received_at) == 0
+            assert metrics_enabled.REQUEST_WAIT._values[()][0][-1] == 0
+            assert sum(metrics_enabled.REQUEST_WAIT._values[()][0]) == 1
+            assert sum(metrics_enabled.COMMAND_DURATION._values[("cmd",)][0]) == 1
+
+        def test_metrics_completed(self, processor, metrics_enabled):
+            future = processor.on_message_received(
+                json.dumps({"command": "cmd", "status": "SUCCESS"}), {}
+            )
+            future.result(timeout=5)
+
+            assert len(processor._received_at) == 0
+
+        def test_metrics_requeued(self, processor, pool_mock, metrics_enabled):
+            processor._target = Mock()
+            message = json.dumps({"command": "cmd", "status": "CREATED"})
+
+            processor.on_message_received(message, {})
+            waiting = processor.on_message_received(message, {})
+            assert len(processor._received_at) == 2
+
+            processor.drain(0)
+            assert isinstance(waiting.exception(), RequeueMessageException)
+            assert len(processor._received_at) == 1
+
         @pytest.mark.parametrize(
             "ex,has_stacktrace",
             [
@@ -300,6 +533,61 @@ class TestRequestProcessor(object):
         def test_format(self, processor, output, expected):
             assert processor._format_output(output) == expected
 
+        @pytest.mark.parametrize("duration,updates", [(0, 1), (0.2, 2)])
+        def test_in_progress_delay(
+            self, processor, target_mock, updater_mock, invoke_mock, duration, updates
+        ):
+            statuses = []
+            updater_mock.update_request.side_effect = lambda r, _: statuses.append(
+                r.status
+            )
+            invoke_mock.side_effect = lambda *_: time.sleep(duration)
+            processor._in_progress_delay = 0.05
+
+            processor.process_message(target_mock, Request(id="1"), {})
+            assert updater_mock.update_request.call_count == updates
+            assert statuses == ["IN_PROGRESS", "SUCCESS"][-updates:]
+
+        def test_in_progress_delay_error(
+            self, caplog, processor, target_mock, updater_mock, invoke_mock
+        ):
+            updater_mock.update_request.side_effect = [ValueError, None]
+            invoke_mock.side_effect = lambda *_: time.sleep(0.2)
+            processor._in_progress_delay = 0.05
+
+            request = Request(id="1")
+            processor.process_message(target_mock, request, {})
+            assert updater_mock.update_request.call_count == 2
+            assert request.status == "SUCCESS"
+            assert caplog.records[0].levelno == logging.WARNING
+
+        def test_in_progress_delay_failure_headers(
+            self, processor, target_mock, invoke_mock
+        ):
+            def update_request(request_id, status=None, **_):
+                if status == "IN_PROGRESS":
+                    raise RestError("in progress failed")
+                statuses.append(status)
+
+            statuses = []
+            client = Mock(update_request=Mock(side_effect=update_request))
+            processor._updater = HTTPRequestUpdater(
+                client, threading.Event(), max_attempts=1
+            )
+            invoke_mock.side_effect = lambda *_: time.sleep(0.2) or "done"
+            processor._in_progress_delay = 0.05
+
+            headers = {}
+            processor.process_message(target_mock, Request(id="1"), headers)
+            assert statuses == ["SUCCESS"]
+            assert headers == {}
+
+        def test_returns_update_result(
+            self, processor, target_mock, updater_mock, invoke_mock
+        ):
+            ret_val = processor.process_message(target_mock, Mock(), {})
+            assert ret_val == updater_mock.update_request.return_value
+
         def test_process_children(
             self, processor, target_mock, updater_mock, invoke_mock, format_mock
         ):
@@ -312,6 +600,297 @@ class TestRequestProcessor(object):
             assert request_mock.status == "SUCCESS"
             assert request_mock.output == format_mock.return_value
 
+    class TestProcessMessageAsync(object):
+        @pytest.fixture
+        def run(self, processor):
+            def _run(coroutine):
+                future = asyncio.run_coroutine_threadsafe(
+                    coroutine, processor._get_event_loop()
+                )
+                return future.result(timeout=5)
+
+            yield _run
+            processor._stop_event_loop()
+
+        def test_process(self, processor, run, updater_mock, invoke_mock):
+            async def command():
+                return {"foo": "bar"}
+
+            request_mock = Mock()
+            invoke_mock.side_effect = lambda *_: command()
+
+            run(processor.process_message_async(Mock(), request_mock, {}))
+            assert updater_mock.update_request.call_count == 2
+            assert request_mock.status == "SUCCESS"
+            assert request_mock.output == json.dumps({"foo": "bar"})
+
+        @pytest.mark.parametrize("duration,updates", [(0, 1), (0.2, 2)])
+        def test_in_progress_delay(
+            self, processor, run, updater_mock, invoke_mock, duration, updates
+        ):
+            async def command():
+                await asyncio.sleep(duration)
+
+            statuses = []
+            updater_mock.update_request.side_effect = lambda r, _: statuses.append(
+                r.status
+            )
+            invoke_mock.side_effect = lambda *_: command()
+            processor._in_progress_delay = 0.05
+
+            run(processor.process_message_async(Mock(), Request(id="1"), {}))
+            assert statuses == ["IN_PROGRESS", "SUCCESS"][-updates:]
+
+        def test_invoke_exception(self, processor, run, updater_mock, invoke_mock):
+            async def command():
+                raise ValueError("I'm an error")
+
+            request_mock = Mock(is_json=False)
+            invoke_mock.side_effect = lambda *_: command()
+
+            run(processor.process_message_async(Mock(), request_mock, {}))
+            assert updater_mock.update_request.call_count == 2
+            assert request_mock.status == "ERROR"
+            assert request_mock.error_class == "ValueError"
+            assert request_mock.output == "I'm an error"
+
+        def test_concurrency_limit(self, processor, run, invoke_mock):
+            running = []
+            peak = []
+
+            async def command():
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+            processor._max_async_workers = 2
+            invoke_mock.side_effect = lambda *_: command()
+
+            async def run_all():
+                await asyncio.gather(
+                    *[
+                        processor.process_message_async(Mock(), Mock(), {})
+                        for _ in range(6)
+                    ]
+                )
+
+            run(run_all())
+            assert max(peak) == 2
+
+        def test_command_concurrency_limit(self, processor, run, invoke_mock):
+            running = []
+            peak = []
+
+            class LimitedClient(object):
+                @command(max_concurrent=1)
+                async def command(self):
+                    running.append(1)
+                    peak.append(len(running))
+                    await asyncio.sleep(0.01)
+                    running.pop()
+
+            target = LimitedClient()
+            invoke_mock.side_effect = lambda *_: target.command()
+
+            async def run_all():
+                await asyncio.gather(
+                    *[
+                        processor.process_message_async(
+                            target, Request(id=str(i), command="command"), {}
+                        )
+                        for i in range(4)
+                    ]
+                )
+
+            run(run_all())
+            assert max(peak) == 1
+
+        def test_request_context(self, processor, run, invoke_mock):
+            seen = {}
+
+            async def command():
+                current = brewtils.plugin.request_context.current_request
+                await asyncio.sleep(0.05 if current.id == "a" else 0.01)
+                seen[current.id] = brewtils.plugin.request_context.current_request
+
+            invoke_mock.side_effect = lambda *_: command()
+            requests = [Request(id="a"), Request(id="b")]
+            brewtils.plugin.request_context.current_request = None
+
+            async def run_all():
+                await asyncio.gather(
+                    *[
+                        processor.process_message_async(Mock(), request, {})
+                        for request in requests
+                    ]
+                )
+
+            run(run_all())
+            assert seen == {"a": requests[0], "b": requests[1]}
+            assert brewtils.plugin.request_context.current_request is None
+
+    class TestOffloadLargeOutput(object):
+        @pytest.fixture
+        def ez_client(self, processor):
+            ez_client = Mock()
+            ez_client.upload_chunked_file.return_value = Resolvable(
+                type="base64", storage="gridfs", details={"file_id": "file_id"}
+            )
+
+            processor._ez_client = ez_client
+            processor._max_output_size = 10
+
+            return ez_client
+
+        def test_small(self, processor, ez_client):
+            request = Request(id="1", output="small")
+
+            processor._offload_large_output(request)
+            assert ez_client.upload_chunked_file.called is False
+            assert request.output == "small"
+
+        def test_large(self, processor, ez_client):
+            request = Request(id="1", output="much too large")
+
+            processor._offload_large_output(request)
+            assert ez_client.upload_chunked_file.call_args[0][0].getvalue() == (
+                b"much too large"
+            )
+            assert json.loads(request.output) == {
+                "output_file_id": "file_id",
+                "file_name": "1-output",
+                "size": 14,
+            }
+
+        def test_upload_error(self, processor, ez_client):
+            ez_client.upload_chunked_file.side_effect = ValueError
+            request = Request(id="1", output="much too large")
+
+            processor._offload_large_output(request)
+            assert request.output == "much too large"
+
+        def test_process_message(self, processor, ez_client, updater_mock):
+            class LargeClient(object):
+                def command(self):
+                    return "much too large"
+
+            processor.process_message(
+                LargeClient(), Request(id="1", command="command", parameters={}), {}
+            )
+
+            request = updater_mock.update_request.call_args[0][0]
+            assert request.status == "SUCCESS"
+            assert json.loads(request.output)["output_file_id"] == "file_id"
+
+    class TestDrain(object):
+        @pytest.fixture
+        def release(self, processor):
+            """Make process_message block until the returned Event is set"""
+            release = threading.Event()
+            started = threading.Event()
+
+            def block(*_):
+                started.set()
+                release.wait(5)
+
+            processor.process_message = Mock(side_effect=block)
+            processor.on_message_received(json.dumps({"id": "running"}), {})
+            started.wait(5)
+
+            yield release
+            release.set()
+
+        def test_drain(self, processor, release):
+            waiting = processor.on_message_received(json.dumps({"id": "waiting"}), {})
+
+            threading.Timer(0.05, release.set).start()
+            stats = processor.drain(5)
+
+            assert isinstance(waiting.exception(), RequeueMessageException)
+            assert stats["completed"] == 1
+            assert stats["requeued"] == 1
+            assert stats["abandoned"] == 0
+
+        def test_deadline(self, processor, release):
+            stats = processor.drain(0.01)
+            assert stats["completed"] == 0
+            assert stats["abandoned"] == 1
+
+        def test_abandoned(self, processor, updater_mock):
+            started = threading.Event()
+            release = threading.Event()
+
+            class SlowClient(object):
+                def command(self):
+                    started.set()
+                    release.wait(5)
+                    return "done"
+
+            processor._target = SlowClient()
+            message = json.dumps({"command": "command", "status": "CREATED"})
+            running = processor.on_message_received(message, {})
+            started.wait(5)
+
+            stats = processor.drain(0.01)
+            release.set()
+
+            assert stats["abandoned"] == 1
+            assert isinstance(running.exception(5), RequeueMessageException)
+            assert updater_mock.update_request.call_count == 1
+
+        def test_received_while_draining(self, processor):
+            processor.drain(0)
+
+            with pytest.raises(RequeueMessageException):
+                processor.on_message_received(json.dumps({"id": "new"}), {})
+
+        def test_limited_held(self, processor, pool_mock):
+            class LimitedClient(object):
+                @command(max_concurrent=1)
+                def command(self):
+                    return "done"
+
+            processor._target = LimitedClient()
+            message = json.dumps({"command": "command", "status": "CREATED"})
+
+            processor.on_message_received(message, {})
+            held = processor.on_message_received(message, {})
+
+            stats = processor.drain(0)
+            assert isinstance(held.exception(), RequeueMessageException)
+            assert stats["requeued"] == 1
+
+        def test_async(self, processor, updater_mock):
+            started = threading.Event()
+
+            class AsyncClient(object):
+                async def command(self):
+                    started.set()
+                    await asyncio.sleep(5)
+
+            processor._target = AsyncClient()
+            processor._max_async_workers = 1
+
+            message = json.dumps({"command": "command", "status": "CREATED"})
+            running = processor.on_message_received(message, {})
+            waiting = processor.on_message_received(message, {})
+            started.wait(5)
+
+            stats = processor.drain(0.01)
+            processor._stop_event_loop(timeout=0)
+
+            assert running.cancelled() is True
+            assert waiting.cancelled() is True
+            assert stats["abandoned"] == 2
+
+        def test_shutdown(self, processor, consumer_mock, release):
+            processor._drain_timeout = 0.01
+
+            stats = processor.shutdown()
+            assert stats["abandoned"] == 1
+            assert consumer_mock.stop.called is True
+
     class TestParse(object):
         def test_success(self, processor, bg_request):
             serialized = SchemaParser.serialize_request(bg_request)
@@ -344,6 +923,42 @@ class TestRequestProcessor(object):
             assert ret_val == getattr(target_mock, command).return_value
             getattr(target_mock, command).assert_called_once_with()
 
+        def test_cache(self, processor, metrics_enabled):
+            calls = []
+
+            class CachedClient(object):
+                @command(cache=True)
+                def command(self, value):
+                    calls.append(value)
+                    return value * 2
+
+            target = CachedClient()
+            outputs = [
+                processor._invoke_command(
+                    target, Request(command="command", parameters={"value": v}), {}
+                )
+                for v in [1, 1, 2, 1]
+            ]
+
+            assert outputs == [2, 2, 4, 2]
+            assert calls == [1, 2]
+            assert processor._result_caches["command"].hits == 2
+            assert metrics_enabled.CACHE_HITS._values == {("command",): 2}
+            assert metrics_enabled.CACHE_MISSES._values == {("command",): 2}
+
+        def test_cache_error(self, processor):
+            class CachedClient(object):
+                @command(cache=True)
+                def command(self):
+                    raise ValueError
+
+            request = Request(command="command", parameters={})
+            for _ in range(2):
+                with pytest.raises(ValueError):
+                    processor._invoke_command(CachedClient(), request, {})
+
+            assert len(processor._result_caches["command"]) == 0
+
         def test_missing_attribute(self, processor, target_mock):
             target_mock.mock_add_spec("other_command")
 
@@ -368,6 +983,61 @@ class TestRequestProcessor(object):
             assert ret_val == getattr(target_mock, command).return_value
             getattr(target_mock, command).assert_called_with(p1="param")
 
+        def test_process_executor(self, processor):
+            processor._target = ProcessClient()
+            request = Request(command="pid", parameters={"offset": 1})
+
+            try:
+                ret_val = processor._invoke_command(processor._target, request, {})
+            finally:
+                processor._process_pool.shutdown(wait=True)
+
+            # Output is formatted in the worker, which is not this process
+            assert isinstance(ret_val, str)
+            assert int(ret_val) - 1 != os.getpid()
+
+        def test_process_executor_context(self, processor):
+            processor._target = ProcessClient()
+            request = Request(id="1", command="context", parameters={"big": "x" * 10})
+
+            try:
+                ret_val = processor._invoke_command(processor._target, request, {})
+            finally:
+                processor._process_pool.shutdown(wait=True)
+
+            # Only the fields needed for the request context are sent to the worker
+            assert json.loads(ret_val) == {"id": "1", "parameters": None}
+
+        def test_process_executor_worker_dies(self, processor):
+            processor._target = ProcessClient()
+            processor._max_process_workers = 1
+            crash = Request(command="crash", parameters={})
+            pid = Request(command="pid", parameters={})
+
+            try:
+                processor._invoke_command(processor._target, pid, {})
+                broken = processor._process_pool
+
+                with pytest.raises(BrokenProcessPool):
+                    processor._invoke_command(processor._target, crash, {})
+                assert processor._process_pool is None
+
+                # The next process command gets a new pool
+                assert processor._invoke_command(processor._target, pid, {})
+                assert processor._process_pool is not broken
+            finally:
+                processor._process_pool.shutdown(wait=True)
+
+        def test_process_start_method(self, processor):
+            processor._target = ProcessClient()
+            processor._process_start_method = "spawn"
+
+            try:
+                pool = processor._get_process_pool()
+                assert pool._mp_context.get_start_method() == "spawn"
+            finally:
+                processor._process_pool.shutdown(wait=True)
+
         def test_call_resolve(self, processor, target_mock, bg_command):
             request = Request(command=bg_command.name, parameters={"message": "test"})
 
@@ -377,11 +1047,64 @@ class TestRequestProcessor(object):
                 definitions=bg_command.parameters,
                 upload=False,
                 allow_any_parameter=False,
+                plan=processor._resolver.compile.return_value,
             )
             getattr(target_mock, bg_command.name).assert_called_once_with(
                 message="test"
             )
 
+        def test_dispatch(self, processor, target_mock, bg_system, bg_command):
+            request = Request(command=bg_command.name, parameters={"message": "test"})
+            bg_system.get_command_by_name = Mock()
+
+            for _ in range(2):
+                processor._invoke_command(target_mock, request, {})
+
+            dispatch = processor._dispatch[bg_command.name]
+            assert dispatch.method is getattr(target_mock, bg_command.name)
+            assert dispatch.command is bg_command
+            assert processor._resolver.resolve.call_args[1]["plan"] is dispatch.plan
+            assert bg_system.get_command_by_name.called is False
+
+        def test_dispatch_without_resolver(
+            self, processor, target_mock, bg_system, bg_command
+        ):
+            processor._resolver = None
+            request = Request(
+                command=bg_command.name,
+                command_type="EPHEMERAL",
+                parameters={"message": "test"},
+            )
+
+            processor._invoke_command(target_mock, request, {})
+            getattr(target_mock, bg_command.name).assert_called_once_with(
+                message="test"
+            )
+
+        def test_resolver_without_compile(
+            self, processor, target_mock, bg_system, bg_command
+        ):
+            processor._resolver = Mock(spec=["resolve"])
+            processor._resolver.resolve.return_value = {"message": "test"}
+            request = Request(command=bg_command.name, parameters={"message": "test"})
+
+            processor._invoke_command(target_mock, request, {})
+            processor._resolver.resolve.assert_called_once_with(
+                request.parameters,
+                definitions=bg_command.parameters,
+                upload=False,
+                allow_any_parameter=False,
+            )
+
+        def test_dispatch_rebuilt(self, processor, target_mock, bg_system, bg_command):
+            table = processor._get_dispatch(target_mock)
+            assert processor._get_dispatch(target_mock) is table
+
+            bg_system.commands = [bg_command]
+            assert processor._get_dispatch(target_mock) is not table
+
+            assert processor._get_dispatch(Mock()) is not table
+
 
 class TestHTTPRequestUpdater(object):
     @pytest.fixture
@@ -453,6 +1176,12 @@ class TestHTTPRequestUpdater(object):
             updater.update_request(bg_request, {"retry_attempt": 1, "time_to_wait": 1})
             assert shutdown_event.wait.called is True
 
+        def test_metrics(self, updater, bg_request, metrics_enabled):
+            updater.update_request(bg_request, {"retry_attempt": 1, "time_to_wait": 1})
+
+            assert metrics_enabled.UPDATE_RETRIES._values[()] == 1
+            assert (bg_request.status,) in metrics_enabled.UPDATE_DURATION._values
+
         def test_update_request_headers(self, updater, client, bg_request):
             client.update_request.side_effect = ValueError
 
@@ -519,6 +1248,157 @@ class TestHTTPRequestUpdater(object):
         assert not updater.connection_poll_thread.is_alive()
 
 
+class TestQueuedHTTPRequestUpdater(object):
+    @pytest.fixture
+    def client(self):
+        return Mock()
+
+    @pytest.fixture
+    def shutdown_event(self):
+        return threading.Event()
+
+    @pytest.fixture
+    def updater(self, monkeypatch, client, shutdown_event):
+        monkeypatch.setattr(
+            HTTPRequestUpdater, "_create_connection_poll_thread", Mock()
+        )
+
+        # No flusher threads, so tests can control when updates are sent
+        return QueuedHTTPRequestUpdater(client, shutdown_event, max_workers=0)
+
+    @pytest.fixture
+    def flush(self, updater):
+        def _flush():
+            flusher = threading.Thread(target=updater._flush)
+            flusher.daemon = True
+            flusher.start()
+
+            updater.shutdown()
+
+        return _flush
+
+    def test_update(self, updater, client, flush, bg_request):
+        future = updater.update_request(bg_request, {})
+        assert future.done() is False
+        assert client.update_request.called is False
+
+        flush()
+        assert future.result() is None
+        client.update_request.assert_called_once_with(
+            bg_request.id,
+            status=bg_request.status,
+            output=bg_request.output,
+            error_class=bg_request.error_class,
+        )
+
+    def test_ephemeral(self, updater, client):
+        future = updater.update_request(Mock(is_ephemeral=True), {})
+        assert future.result() is None
+        assert client.update_request.called is False
+
+    def test_snapshot(self, updater, client, flush, bg_request):
+        bg_request.status = "IN_PROGRESS"
+        updater.update_request(bg_request, {})
+        bg_request.status = "CANCELED"
+
+        flush()
+        assert client.update_request.call_args[1]["status"] == "IN_PROGRESS"
+
+    def test_stale_update_dropped(self, updater, client, flush, bg_request):
+        bg_request.status = "IN_PROGRESS"
+        in_progress = updater.update_request(bg_request, {})
+
+        bg_request.status = "SUCCESS"
+        final = updater.update_request(bg_request, {})
+        assert in_progress.result() is None
+
+        bg_request.status = "IN_PROGRESS"
+        late = updater.update_request(bg_request, {})
+        assert late.result() is None
+
+        flush()
+        assert final.result() is None
+        client.update_request.assert_called_once_with(
+            bg_request.id, status="SUCCESS", output=ANY, error_class=ANY
+        )
+
+    def test_error(self, updater, client, flush, bg_request):
+        client.update_request.side_effect = ValueError
+        bg_request.status = "SUCCESS"
+
+        future = updater.update_request(bg_request, {})
+
+        flush()
+        assert isinstance(future.exception(), RepublishRequestException)
+
+    def test_retry_backs_off_before_queuing(
+        self, monkeypatch, updater, client, flush, shutdown_event, bg_request
+    ):
+        waits = []
+        monkeypatch.setattr(shutdown_event, "wait", waits.append)
+
+        future = updater.update_request(
+            bg_request, {"retry_attempt": 1, "time_to_wait": 4}
+        )
+        assert waits == [4]
+
+        # Sending the update doesn't wait again
+        flush()
+        assert future.result() is None
+        assert waits == [4]
+
+    def test_in_progress_error(self, caplog, updater, client, flush, bg_request):
+        def update_request(request_id, status=None, **_):
+            if status == "IN_PROGRESS":
+                raise RestError("in progress failed")
+
+        client.update_request.side_effect = update_request
+        updater.max_attempts = 1
+        headers = {}
+
+        bg_request.status = "IN_PROGRESS"
+        in_progress = updater.update_request(bg_request, headers)
+
+        # Send the IN_PROGRESS update before queuing the final one
+        flush()
+        bg_request.status = "SUCCESS"
+        final = updater.update_request(bg_request, headers)
+        flush()
+
+        assert in_progress.result() is None
+        assert final.result() is None
+        assert client.update_request.call_args[1]["status"] == "SUCCESS"
+        assert headers == {}
+        assert caplog.records[-1].levelno == logging.WARNING
+
+    def test_shutdown_beergarden_down(
+        self, updater, client, shutdown_event, bg_request
+    ):
+        client.update_request.side_effect = RequestsConnectionError
+        updater.beergarden_down = True
+        bg_request.status = "SUCCESS"
+        future = updater.update_request(bg_request, {})
+
+        flusher = threading.Thread(target=updater._flush)
+        flusher.daemon = True
+        flusher.start()
+
+        # Wait for the flusher to start waiting for Beer-garden to come back
+        deadline = time.monotonic() + 5
+        while not updater.beergarden_error_condition._waiters:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        shutdown_event.set()
+        stopper = threading.Thread(target=updater.shutdown)
+        stopper.daemon = True
+        stopper.start()
+        stopper.join(5)
+
+        assert stopper.is_alive() is False
+        assert isinstance(future.exception(), RepublishRequestException)
+
+
 class TestLocalRequestProcessor(object):
     @pytest.fixture
     def client(self):
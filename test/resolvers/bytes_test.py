@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+import pytest
+from mock import Mock
+
+from brewtils.cache import FileCache
+from brewtils.models import Parameter
+from brewtils.resolvers.bytes import BytesResolver
+
+
+@pytest.fixture
+def ez_client():
+    return Mock()
+
+
+@pytest.fixture
+def file_cache(tmpdir):
+    return FileCache(str(tmpdir), 1024)
+
+
+@pytest.fixture
+def definition():
+    return Parameter(type="bytes")
+
+
+class TestDownload(object):
+    def test_download(self, ez_client, definition, bg_resolvable):
+        resolver = BytesResolver(ez_client)
+
+        assert (
+            resolver.download(bg_resolvable, definition)
+            == ez_client.download_bytes.return_value
+        )
+        ez_client.download_bytes.assert_called_once_with(bg_resolvable.id)
+
+    def test_lazy(self, ez_client, bg_resolvable):
+        resolver = BytesResolver(ez_client)
+        definition = Parameter(type="bytes", type_info={"lazy": True})
+
+        assert (
+            resolver.download(bg_resolvable, definition)
+            == ez_client.open_bytes.return_value
+        )
+        assert ez_client.download_bytes.called is False
+
+    def test_cache_miss(self, ez_client, file_cache, definition, bg_resolvable):
+        ez_client.download_bytes.return_value = b"content"
+        resolver = BytesResolver(ez_client, file_cache=file_cache)
+
+        assert resolver.download(bg_resolvable, definition) == b"content"
+        assert file_cache.get(bg_resolvable.id).read() == b"content"
+
+    def test_cache_hit(self, ez_client, file_cache, definition, bg_resolvable):
+        file_cache.put(bg_resolvable.id, io.BytesIO(b"content"))
+        resolver = BytesResolver(ez_client, file_cache=file_cache)
+
+        assert resolver.download(bg_resolvable, definition) == b"content"
+        assert ez_client.download_bytes.called is False
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import io
 import os
 
 import pytest
 from mock import Mock
 
+from brewtils.cache import FileCache
 from brewtils.models import Parameter
 from brewtils.resolvers.chunks import ChunksResolver
 
@@ -60,3 +62,48 @@ class TestShouldDownload(object):
 def test_download(resolver, ez_client, definition, bg_resolvable_chunk):
     resolver.download(bg_resolvable_chunk, definition)
     ez_client.download_chunked_file.assert_called_once_with(bg_resolvable_chunk.id)
+
+
+def test_download_lazy(resolver, ez_client, bg_resolvable_chunk):
+    definition = Parameter(type="base64", type_info={"lazy": True})
+
+    assert (
+        resolver.download(bg_resolvable_chunk, definition)
+        == ez_client.open_chunked_file.return_value
+    )
+    ez_client.open_chunked_file.assert_called_once_with(bg_resolvable_chunk.id)
+    assert ez_client.download_chunked_file.called is False
+
+
+class TestDownloadCached(object):
+    @pytest.fixture
+    def file_cache(self, tmpdir):
+        return FileCache(str(tmpdir), 1024)
+
+    @pytest.fixture
+    def resolver(self, ez_client, file_cache):
+        return ChunksResolver(ez_client, file_cache=file_cache)
+
+    def test_miss(self, resolver, ez_client, definition, bg_resolvable_chunk):
+        ez_client.download_chunked_file.return_value = io.BytesIO(b"content")
+
+        resolved = resolver.download(bg_resolvable_chunk, definition)
+        assert resolved.read() == b"content"
+
+        assert resolver.file_cache.get(bg_resolvable_chunk.id).read() == b"content"
+
+    def test_hit(self, resolver, ez_client, definition, bg_resolvable_chunk):
+        resolver.file_cache.put(bg_resolvable_chunk.id, io.BytesIO(b"content"))
+
+        resolved = resolver.download(bg_resolvable_chunk, definition)
+        assert resolved.read() == b"content"
+        assert ez_client.download_chunked_file.called is False
+
+    def test_lazy(self, resolver, ez_client, bg_resolvable_chunk):
+        resolver.file_cache.put(bg_resolvable_chunk.id, io.BytesIO(b"content"))
+        definition = Parameter(type="base64", type_info={"lazy": True})
+
+        assert (
+            resolver.download(bg_resolvable_chunk, definition)
+            == ez_client.open_chunked_file.return_value
+        )
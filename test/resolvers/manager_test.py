@@ -4,6 +4,8 @@ import pytest
 from mock import Mock
 
 from brewtils.errors import RequestProcessException
+from brewtils.models import Parameter
+from brewtils.resolvers import ResolverBase
 from brewtils.resolvers.manager import ResolutionManager
 
 
@@ -272,3 +274,98 @@ class TestAnyParameters(object):
             manager.resolve(
                 values, definitions=bg_command.parameters, allow_any_parameter=False
             )
+
+
+class TestCompile(object):
+    @pytest.fixture
+    def manager(self):
+        return ResolutionManager(easy_client=Mock())
+
+    def test_compile(self, manager, bg_command):
+        message = bg_command.parameters[0]
+
+        plan = manager.compile(bg_command.parameters, upload=False)
+
+        assert list(plan.entries) == ["message"]
+        assert plan.entries["message"][0] is message
+        assert plan.entries["message"][1].entries["nested"][0] is message.parameters[0]
+        assert plan.resolvable is False
+        assert plan.nested is True
+
+    def test_first_definition(self, manager, bg_command):
+        duplicate = Parameter(key="message")
+
+        plan = manager.compile(bg_command.parameters + [duplicate])
+        assert plan.entries["message"][0] is bg_command.parameters[0]
+
+    @pytest.mark.parametrize(
+        "param_type,type_info,upload,resolvable",
+        [
+            ("Any", {}, False, False),
+            ("Bytes", {}, False, True),
+            ("Base64", {}, False, True),
+            ("Any", {"autoresolve": False}, False, False),
+            # Any parameter can be given a Resolvable when uploading
+            ("Any", {}, True, True),
+            (None, {}, False, False),
+        ],
+    )
+    def test_resolvable(self, manager, param_type, type_info, upload, resolvable):
+        plan = manager.compile(
+            [Parameter(key="p", type=param_type, type_info=type_info)], upload=upload
+        )
+        assert plan.entries["p"][2] is resolvable
+        assert plan.resolvable is resolvable
+
+    def test_resolvable_custom(self, manager):
+        manager.resolvers.append(Mock(spec=ResolverBase))
+
+        plan = manager.compile([Parameter(key="p", type="Any")], upload=False)
+        assert plan.resolvable is True
+
+    def test_resolve_with_plan(self, manager, bg_command):
+        values = {"message": {"nested": "hi"}}
+        plan = manager.compile(bg_command.parameters)
+
+        assert manager.resolve(values, plan=plan) == values
+
+        with pytest.raises(RequestProcessException):
+            manager.resolve({"other": "hi"}, plan=plan)
+
+
+class TestSkipResolution(object):
+    @pytest.fixture
+    def definitions(self):
+        return [
+            Parameter(key="message", type="String", multi=True),
+            Parameter(key="data", type="Bytes"),
+        ]
+
+    def test_skip_command(self, manager, resolver_mock, definitions):
+        resolver_mock.may_download.return_value = False
+        values = {"message": ["a", "b"]}
+
+        plan = manager.compile(definitions[:1], upload=False)
+        assert manager.resolve(values, upload=False, plan=plan) == values
+        assert resolver_mock.should_download.called is False
+
+        with pytest.raises(RequestProcessException):
+            manager.resolve({"other": "a"}, upload=False, plan=plan)
+
+        assert manager.resolve({"other": "a"}, upload=False, allow_any_parameter=True)
+
+    def test_skip_key(self, manager, resolver_mock, definitions):
+        resolver_mock.may_download.side_effect = lambda d: d.type == "Bytes"
+        resolver_mock.should_download.return_value = True
+        resolver_mock.download.return_value = b"bytes"
+
+        resolved = manager.resolve(
+            {"message": ["a", "b"], "data": {"id": "1"}},
+            definitions=definitions,
+            upload=False,
+        )
+
+        assert resolved == {"message": ["a", "b"], "data": b"bytes"}
+        resolver_mock.should_download.assert_called_once_with(
+            {"id": "1"}, definitions[1]
+        )
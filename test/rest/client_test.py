@@ -2,12 +2,14 @@
 
 import json
 import os
+from base64 import b64decode, b64encode
+from io import BytesIO
 import warnings
 
 import brewtils.rest
 import pytest
 import requests.exceptions
-from brewtils.rest.client import RestClient
+from brewtils.rest.client import RestClient, _encoded_chunks
 from mock import ANY, MagicMock, Mock
 from yapconf.exceptions import YapconfItemError
 
@@ -420,6 +422,108 @@ class TestRestClient(object):
 
         assert ret == response
 
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_post_chunked_file_workers(
+        self, monkeypatch, client, session_mock, tmpdir, resolvable_chunk_dict, workers
+    ):
+        path = os.path.join(str(tmpdir), "foo.txt")
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+
+        response = Mock(ok=True, json=Mock(return_value=resolvable_chunk_dict))
+        monkeypatch.setattr(client.session, "get", Mock(return_value=response))
+
+        # The chunk with offset 2 fails once, and is then retried
+        sent = []
+        failed = []
+
+        def post(url, json):
+            if json["offset"] == 2 and not failed:
+                failed.append(json["offset"])
+                return Mock(ok=False)
+
+            sent.append((json["offset"], b64decode(json["data"])))
+            return Mock(ok=True)
+
+        monkeypatch.setattr(client.session, "post", post)
+
+        with open(path, "rb") as f:
+            client.post_chunked_file(f, file_params={"chunk_size": 3}, workers=workers)
+
+        assert sorted(sent) == [(0, b"012"), (1, b"345"), (2, b"678"), (3, b"9")]
+        assert failed == [2]
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_post_chunked_file_position(
+        self, monkeypatch, client, session_mock, tmpdir, resolvable_chunk_dict, workers
+    ):
+        path = os.path.join(str(tmpdir), "foo.txt")
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+
+        response = Mock(ok=True, json=Mock(return_value=resolvable_chunk_dict))
+        monkeypatch.setattr(client.session, "get", Mock(return_value=response))
+
+        sent = []
+
+        def post(url, json):
+            sent.append((json["offset"], b64decode(json["data"])))
+            return Mock(ok=True)
+
+        monkeypatch.setattr(client.session, "post", post)
+
+        with open(path, "rb") as f:
+            client.post_chunked_file(
+                f, file_params={"chunk_size": 4}, current_position=2, workers=workers
+            )
+
+        assert sorted(sent) == [(0, b"2345"), (1, b"6789")]
+
+    @pytest.mark.parametrize("mappable", [True, False])
+    def test_encoded_chunks_position(self, tmpdir, mappable):
+        path = os.path.join(str(tmpdir), "foo.txt")
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+
+        with open(path, "rb") as f:
+            fd = f if mappable else BytesIO(f.read())
+            fd.seek(2)
+
+            # Both paths start from the file's current position
+            assert list(_encoded_chunks(fd, 4)) == [
+                b64encode(b"2345"),
+                b64encode(b"6789"),
+            ]
+
+    def test_post_chunked_file_unmappable(
+        self, monkeypatch, client, session_mock, resolvable_chunk_dict
+    ):
+        response = Mock(ok=True, json=Mock(return_value=resolvable_chunk_dict))
+        monkeypatch.setattr(client.session, "get", Mock(return_value=response))
+        monkeypatch.setattr(client.session, "post", Mock(return_value=Mock(ok=True)))
+
+        client.post_chunked_file(BytesIO(b"0123456789"), file_params={"chunk_size": 6})
+
+        assert [c[1]["json"]["data"] for c in client.session.post.call_args_list] == [
+            b64encode(b"012345"),
+            b64encode(b"6789"),
+        ]
+
+    def test_post_chunked_file_retries(
+        self, monkeypatch, client, session_mock, tmpdir, resolvable_chunk_dict
+    ):
+        path = os.path.join(str(tmpdir), "foo.txt")
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+
+        response = Mock(ok=True, json=Mock(return_value=resolvable_chunk_dict))
+        monkeypatch.setattr(client.session, "get", Mock(return_value=response))
+        monkeypatch.setattr(client.session, "post", Mock(return_value=Mock(ok=False)))
+
+        with open(path, "rb") as f:
+            with pytest.raises(RuntimeError):
+                client.post_chunked_file(f, file_params={"chunk_size": 3}, workers=2)
+
     def test_patch_admin(self, client, session_mock):
         client.patch_admin(payload="payload")
         session_mock.patch.assert_called_with(
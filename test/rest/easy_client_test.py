@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 
 import copy
+import os
+import tempfile
+import time
 import warnings
 from base64 import b64decode, b64encode
+from hashlib import md5
+from io import BytesIO
 
+import brewtils.cache
 import brewtils.rest.easy_client
 import pytest
 from brewtils.errors import (
@@ -581,6 +587,97 @@ class TestChunked(object):
         byte_obj = client.download_chunked_file("file_id")
         assert byte_obj.read() == b64decode(file_data)
 
+    @pytest.mark.parametrize("spool_size,rolled", [(4, True), (100, False)])
+    def test_download_chunked_file_spooled(
+        self, client, rest_client, spool_size, rolled
+    ):
+        data = b"file content"
+        client._check_chunked_file_validity = Mock(
+            return_value=(
+                True,
+                {"number_of_chunks": 1, "md5_sum": md5(data).hexdigest()},
+            )
+        )
+        rest_client.get_chunked_file.return_value = Mock(
+            ok=True, json=Mock(return_value={"data": b64encode(data)})
+        )
+
+        file_obj = client.download_chunked_file("file_id", spool_size=spool_size)
+        assert file_obj._rolled is rolled
+        assert file_obj.read() == data
+
+    def test_download_spool_size(self, monkeypatch):
+        monkeypatch.setattr(brewtils.rest.easy_client, "RestClient", Mock())
+
+        client = EasyClient(download_spool_size=10)
+        client._check_chunked_file_validity = Mock(
+            return_value=(True, {"number_of_chunks": 0})
+        )
+
+        assert isinstance(
+            client.download_chunked_file("file_id"), tempfile.SpooledTemporaryFile
+        )
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_download_chunked_file_workers(self, client, rest_client, workers):
+        chunks = [b"a", b"b", b"c", b"d", b"e"]
+        failed = []
+
+        # Later chunks finish first, and chunk 1 fails once before it's retried
+        def get_chunked_file(file_id, params):
+            chunk = params["chunk"]
+            time.sleep(0.01 * (len(chunks) - chunk))
+
+            if chunk == 1 and not failed:
+                failed.append(chunk)
+                return Mock(ok=False)
+
+            return Mock(
+                ok=True, json=Mock(return_value={"data": b64encode(chunks[chunk])})
+            )
+
+        rest_client.get_chunked_file.side_effect = get_chunked_file
+        client._chunk_workers = workers
+        client._check_chunked_file_validity = Mock(
+            return_value=(True, {"number_of_chunks": len(chunks)})
+        )
+
+        assert client.download_chunked_file("file_id").read() == b"abcde"
+        assert failed == [1]
+
+    def test_download_chunked_file_retries(self, client, rest_client):
+        rest_client.get_chunked_file.return_value = Mock(ok=False)
+        client._chunk_workers = 2
+        client._check_chunked_file_validity = Mock(
+            return_value=(True, {"number_of_chunks": 3})
+        )
+
+        with pytest.raises(ValueError):
+            client.download_chunked_file("file_id")
+        assert rest_client.get_chunked_file.call_count >= 4
+
+    def test_upload_chunked_file_workers(
+        self, client, rest_client, parser, success, target_file, resolvable_chunk_dict
+    ):
+        success.json = Mock(return_value=resolvable_chunk_dict)
+        rest_client.post_chunked_file.return_value = success
+        client._chunk_workers = 4
+        client._check_chunked_file_validity = Mock(return_value=(True, {}))
+
+        client.upload_chunked_file(target_file, "desired_name")
+        assert rest_client.post_chunked_file.call_args[1]["workers"] == 4
+
+    def test_download_chunked_file_md5(self, client, rest_client):
+        client._check_chunked_file_validity = Mock(
+            return_value=(True, {"number_of_chunks": 1, "md5_sum": "bad"})
+        )
+        rest_client.get_chunked_file.return_value = Mock(
+            ok=True, json=Mock(return_value={"data": b64encode(b"content")})
+        )
+
+        with pytest.raises(ValidationError):
+            client.download_chunked_file("file_id")
+
     def test_upload_chunked_file(
         self,
         client,
@@ -605,11 +702,279 @@ class TestChunked(object):
         assert called_kwargs["chunk_size"] == 261120
         assert resolvable == bg_resolvable_chunk
 
+    class TestUploadSources(object):
+        @pytest.fixture
+        def posted(self, client, rest_client, success, resolvable_chunk_dict):
+            posted = {}
+
+            def post_chunked_file(fd, file_params, current_position=0, workers=1):
+                posted["data"] = fd.read()
+                posted["params"] = file_params
+                return success
+
+            success.json = Mock(return_value=resolvable_chunk_dict)
+            rest_client.post_chunked_file.side_effect = post_chunked_file
+            client._check_chunked_file_validity = Mock(return_value=(True, {}))
+
+            return posted
+
+        def test_path(self, client, posted, tmpdir):
+            path = tmpdir.join("foo.txt")
+            path.write_binary(b"file content")
+
+            client.upload_chunked_file(str(path))
+
+            assert posted["data"] == b"file content"
+            assert posted["params"]["file_size"] == 12
+            assert posted["params"]["file_name"] == str(path)
+            assert posted["params"]["md5_sum"] == md5(b"file content").hexdigest()
+
+        def test_path_position(self, client, posted, tmpdir):
+            path = tmpdir.join("foo.txt")
+            path.write_binary(b"file content")
+
+            with open(str(path), "rb") as f:
+                f.seek(5)
+                client.upload_chunked_file(f)
+
+            assert posted["data"] == b"content"
+            assert posted["params"]["file_size"] == 7
+            assert posted["params"]["md5_sum"] == md5(b"content").hexdigest()
+
+        def test_empty_file(self, client, posted, tmpdir):
+            path = tmpdir.join("foo.txt")
+            path.write_binary(b"")
+
+            client.upload_chunked_file(str(path))
+
+            assert posted["data"] == b""
+            assert posted["params"]["file_size"] == 0
+            assert "md5_sum" not in posted["params"]
+
+        def test_pipe(self, client, posted):
+            read_fd, write_fd = os.pipe()
+            os.write(write_fd, b"piped content")
+            os.close(write_fd)
+
+            with os.fdopen(read_fd, "rb") as pipe:
+                client.upload_chunked_file(pipe, "piped")
+
+            assert posted["data"] == b"piped content"
+            assert posted["params"]["file_size"] == 13
+            assert posted["params"]["md5_sum"] == md5(b"piped content").hexdigest()
+
+        def test_generator_bytes_like(self, client, posted):
+            client.upload_chunked_file(
+                (part for part in [bytearray(b"gen"), memoryview(b"erated")])
+            )
+
+            assert posted["data"] == b"generated"
+            assert posted["params"]["file_size"] == 9
+            assert posted["params"]["md5_sum"] == md5(b"generated").hexdigest()
+
+        def test_generator(self, client, posted):
+            client.upload_chunked_file((part for part in [b"gen", "erated"]))
+
+            assert posted["data"] == b"generated"
+            assert posted["params"]["file_size"] == 9
+            assert posted["params"]["file_name"] == "no_file_name_provided"
+            assert posted["params"]["md5_sum"] == md5(b"generated").hexdigest()
+
     def test_upload_file_fail(self, client, rest_client, server_error, target_file):
         rest_client.post_chunked_file.return_value = server_error
         with pytest.raises(SaveError):
             assert client.upload_chunked_file(target_file, "desired_name")
 
+    class TestOpen(object):
+        @pytest.fixture
+        def chunks(self, rest_client):
+            chunks = [b"first ", b"second ", b"third"]
+
+            def get_chunked_file(file_id, params):
+                response = Mock(ok=True)
+                response.json.return_value = {
+                    "data": b64encode(chunks[params["chunk"]])
+                }
+                return response
+
+            rest_client.get_chunked_file.side_effect = get_chunked_file
+            return chunks
+
+        def test_lazy(self, client, rest_client, chunks):
+            client._check_chunked_file_validity = Mock(
+                return_value=(True, {"number_of_chunks": 3})
+            )
+
+            file_obj = client.open_chunked_file("file_id")
+            assert rest_client.get_chunked_file.called is False
+
+            assert file_obj.read(3) == b"fir"
+            assert rest_client.get_chunked_file.call_count == 1
+
+            assert file_obj.read() == b"st second third"
+            assert rest_client.get_chunked_file.call_count == 3
+
+        def test_md5(self, client, chunks):
+            client._check_chunked_file_validity = Mock(
+                return_value=(True, {"number_of_chunks": 3, "md5_sum": "bad"})
+            )
+
+            file_obj = client.open_chunked_file("file_id")
+            file_obj.read(len(chunks[0]))
+
+            with pytest.raises(ValidationError):
+                file_obj.read()
+
+        def test_invalid(self, client, rest_client):
+            client._check_chunked_file_validity = Mock(return_value=(False, {}))
+
+            with pytest.raises(ValidationError):
+                client.open_chunked_file("file_id")
+
+        def test_chunk_failure(self, client, rest_client):
+            client._check_chunked_file_validity = Mock(
+                return_value=(True, {"number_of_chunks": 1})
+            )
+            rest_client.get_chunked_file.return_value = Mock(ok=False)
+
+            with pytest.raises(ValueError):
+                client.open_chunked_file("file_id").read()
+
+
+class TestOpenBytes(object):
+    def test_stream(self, client, rest_client, success):
+        success.raw = BytesIO(b"some bytes")
+        rest_client.get_file.return_value = success
+
+        file_obj = client.open_bytes("file_id")
+        assert rest_client.get_file.called is False
+
+        assert file_obj.read(4) == b"some"
+        rest_client.get_file.assert_called_once_with("file_id", stream=True)
+
+        assert file_obj.read() == b" bytes"
+        assert success.close.called is True
+
+    def test_failure(self, client, rest_client, not_found):
+        rest_client.get_file.return_value = not_found
+
+        with pytest.raises(NotFoundError):
+            client.open_bytes("file_id").read()
+
+
+class TestDownloadFile(object):
+    def test_download(self, client, rest_client, success, tmpdir):
+        success.raw = BytesIO(b"some bytes")
+        rest_client.get_file.return_value = success
+        path = str(tmpdir.join("file"))
+
+        assert client.download_file("file_id", path) == path
+
+        rest_client.get_file.assert_called_once_with("file_id", stream=True)
+        assert tmpdir.join("file").read_binary() == b"some bytes"
+        assert tmpdir.listdir() == [tmpdir.join("file")]
+
+    def test_checksum(self, client, rest_client, success, tmpdir):
+        success.raw = BytesIO(b"some bytes")
+        rest_client.get_file.return_value = success
+        path = str(tmpdir.join("file"))
+
+        client.download_file("file_id", path, md5_sum=md5(b"some bytes").hexdigest())
+
+        assert tmpdir.join("file").read_binary() == b"some bytes"
+
+    def test_checksum_mismatch(self, client, rest_client, success, tmpdir):
+        success.raw = BytesIO(b"some bytes")
+        rest_client.get_file.return_value = success
+        tmpdir.join("file").write_binary(b"old")
+
+        with pytest.raises(ValidationError):
+            client.download_file("file_id", str(tmpdir.join("file")), md5_sum="bad")
+
+        assert tmpdir.join("file").read_binary() == b"old"
+        assert tmpdir.listdir() == [tmpdir.join("file")]
+
+    def test_failure(self, client, rest_client, not_found, tmpdir):
+        rest_client.get_file.return_value = not_found
+
+        with pytest.raises(NotFoundError):
+            client.download_file("file_id", str(tmpdir.join("file")))
+
+        assert tmpdir.listdir() == []
+
+
+class TestUploadReuse(object):
+    @pytest.fixture
+    def client(self, parser, rest_client):
+        client = EasyClient(host="localhost", port="3000", upload_reuse_ttl=60)
+        client.client = rest_client
+        return client
+
+    @pytest.fixture
+    def uploaded(self, client, rest_client, success, resolvable_chunk_dict):
+        success.json = Mock(return_value=resolvable_chunk_dict)
+        rest_client.post_file.return_value = success
+        rest_client.post_chunked_file.return_value = success
+        client._check_chunked_file_validity = Mock(return_value=(True, {}))
+
+    def test_bytes(self, client, rest_client, uploaded):
+        first = client.upload_bytes(b"content")
+        second = client.upload_bytes(b"content")
+
+        assert rest_client.post_file.call_count == 1
+        assert first.id == second.id
+
+        client.upload_bytes(b"other content")
+        assert rest_client.post_file.call_count == 2
+
+    def test_bytes_failure(self, client, rest_client, server_error):
+        rest_client.post_file.return_value = server_error
+
+        for _ in range(2):
+            with pytest.raises(RestError):
+                client.upload_bytes(b"content")
+
+        assert rest_client.post_file.call_count == 2
+
+    def test_bytes_expired(self, client, rest_client, uploaded, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(brewtils.cache.time, "monotonic", lambda: now[0])
+
+        client.upload_bytes(b"content")
+        now[0] += 61
+        client.upload_bytes(b"content")
+
+        assert rest_client.post_file.call_count == 2
+
+    def test_chunked(self, client, rest_client, uploaded, tmpdir):
+        path = tmpdir.join("foo.txt")
+        path.write_binary(b"file content")
+
+        client.upload_chunked_file(str(path))
+        client.upload_chunked_file(str(path))
+        assert rest_client.post_chunked_file.call_count == 1
+
+        client.upload_chunked_file(str(path), desired_filename="bar.txt")
+        assert rest_client.post_chunked_file.call_count == 2
+
+    def test_chunked_file_params(self, client, rest_client, uploaded):
+        for _ in range(2):
+            client.upload_chunked_file(
+                BytesIO(b"file content"), file_params={"chunk_size": 4}
+            )
+
+        assert rest_client.post_chunked_file.call_count == 2
+
+    def test_disabled(self, parser, rest_client, uploaded):
+        client = EasyClient(host="localhost", port="3000")
+        client.client = rest_client
+        client._check_chunked_file_validity = Mock(return_value=(True, {}))
+
+        for _ in range(2):
+            client.upload_bytes(b"content")
+
+        assert rest_client.post_file.call_count == 2
+
 
 class TestTopics(object):
     class TestGet(object):
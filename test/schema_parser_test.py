@@ -4,6 +4,7 @@
 from __future__ import unicode_literals
 
 import copy
+import json
 
 import pytest
 from marshmallow.exceptions import MarshmallowError
@@ -792,6 +793,85 @@ class TestParse(object):
             assert_patch_equal(patch, sorted_patches[index])
 
 
+class TestFastRequestParser(object):
+    @staticmethod
+    def schema_parse(data, from_string=False):
+        return SchemaParser.parse(
+            data, brewtils.models.Request, from_string=from_string
+        )
+
+    @staticmethod
+    def as_dict(request):
+        if isinstance(request, list):
+            return [TestFastRequestParser.as_dict(r) for r in request]
+
+        if not isinstance(request, brewtils.models.Request):
+            return request
+
+        return {
+            key: TestFastRequestParser.as_dict(value)
+            for key, value in vars(request).items()
+        }
+
+    def test_identical(self, request_dict):
+        request_dict["parent"]["children"] = [{"id": "ignored"}]
+        request_dict["children"][0]["parent"] = {"id": "ignored"}
+        request_dict["unknown"] = "ignored"
+
+        fast = brewtils.schema_parser._request_parser.parse(request_dict)
+
+        assert self.as_dict(fast) == self.as_dict(self.schema_parse(request_dict))
+        assert fast.parent.children is None
+        assert fast.children[0].parent is None
+
+    def test_from_string(self, request_dict):
+        data = json.dumps(request_dict)
+
+        assert self.as_dict(
+            SchemaParser.parse_request(data, from_string=True)
+        ) == self.as_dict(self.schema_parse(data, from_string=True))
+
+    @pytest.mark.parametrize(
+        "key,value",
+        [
+            ("id", 1),
+            ("is_event", 1),
+            ("is_event", "true"),
+            ("parameters", []),
+            ("created_at", 1.5),
+            ("created_at", True),
+            ("children", {}),
+            ("parent", "bad"),
+        ],
+    )
+    def test_unsupported(self, request_dict, key, value):
+        request_dict[key] = value
+
+        with pytest.raises(ValueError):
+            brewtils.schema_parser._request_parser.parse(request_dict)
+
+    @pytest.mark.parametrize(
+        "key,value",
+        [
+            ("is_event", 1),
+            ("is_event", "true"),
+            ("created_at", 1.5),
+            ("created_at", 0),
+            ("children", {}),
+        ],
+    )
+    def test_fallback(self, request_dict, key, value):
+        request_dict[key] = value
+
+        try:
+            expected = self.as_dict(self.schema_parse(request_dict))
+        except Exception as ex:
+            with pytest.raises(type(ex)):
+                SchemaParser.parse_request(request_dict)
+        else:
+            assert self.as_dict(SchemaParser.parse_request(request_dict)) == expected
+
+
 class TestSerialize(object):
     @pytest.mark.parametrize(
         "model,expected",